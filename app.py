@@ -1,79 +1,81 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, send_from_directory
-from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, send_file, jsonify
 from datetime import datetime, date
 from config import Config
 import pandas as pd
-import os, joblib, cv2, numpy as np
-from glob import glob
-from sklearn.neighbors import KNeighborsClassifier
+import os, uuid, cv2, numpy as np
+import face_store
+import face_export
+import identities
+import users
+import sprites
+from models import db, User, TrainingJob, Identity
+import jobs
+import metrics
+import rollups
+import exports
+from attendance import log_attendance, records_for_day, history_for, history_count, writer as attendance_writer
+import model_store
+from model_registry import registry
+from voting import UNKNOWN
+from detection import Track
+from enrollment import Enrollment
+from recognition import RecognitionPool, PoolBusy, decode_frame, detector, tracks
+from batcher import MicroBatcher
 
 app = Flask(__name__)
 app.config.from_object(Config)
-db = SQLAlchemy(app)
-
-# --------------------------
-# Database Model
-# --------------------------
-class User(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
-    role = db.Column(db.String(20), nullable=False)
-
-    def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
-
-    def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+db.init_app(app)
+attendance_writer.init_app(app)
+metrics.init_app(app)
 
 with app.app_context():
     db.create_all()
+    jobs.ensure_columns()
+    users.ensure_indexes()
+    identities.reconcile()
+
+batcher = MicroBatcher(app.config['BATCH_WINDOW_MS'], app.config['BATCH_MAX_SIZE'])
+recognition_pool = RecognitionPool(batcher, app.config['RECOGNITION_WORKERS'], app.config['RECOGNITION_QUEUE'])
 
 # --------------------------
 # Helper: Face Training
 # --------------------------
 def train_model():
-    data, labels = [], []
-    for user_dir in os.listdir('static/faces'):
-        folder = os.path.join('static/faces', user_dir)
-        if os.path.isdir(folder):
-            for img in os.listdir(folder):
-                img_path = os.path.join(folder, img)
-                image = cv2.imread(img_path)
-                if image is not None:
-                    resized = cv2.resize(image, (50, 50)).flatten()
-                    data.append(resized)
-                    labels.append(user_dir)
-    if data:
-        model = KNeighborsClassifier(n_neighbors=5)
-        model.fit(data, labels)
-        joblib.dump(model, 'static/face_recognition_model.pkl')
+    # Fit straight from the stored feature arrays; only identities missing
+    # from the store (e.g. first run) get their images decoded.
+    face_store.sync()
+    data, labels = face_store.load_features()
+    if len(data):
+        manifest = model_store.save_model(data, labels, n_neighbors=5, extractor=app.config['FEATURE_EXTRACTOR'])
+        identities.mark_trained(manifest['version'], set(labels))
 
 # --------------------------
 # Helper: Face Capture
 # --------------------------
-def capture_faces(folder, max_images=50):
+def capture_faces(folder, max_images=None, on_progress=None):
+    # Keeps only sharp, distinct single-face samples (see enrollment.py)
+    max_images = max_images or app.config['ENROLL_TARGET_SAMPLES']
+    enroll = Enrollment(folder, max_images,
+                        min_sharpness=app.config['ENROLL_MIN_SHARPNESS'],
+                        min_face=app.config['ENROLL_MIN_FACE'],
+                        duplicate_distance=app.config['ENROLL_DUPLICATE_DISTANCE'])
     cap = cv2.VideoCapture(0)
-    count = 0
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+    track = Track()
+    frames = 0
 
-    while count < max_images:
+    while not enroll.done and frames < app.config['ENROLL_MAX_FRAMES']:
         ret, frame = cap.read()
         if not ret:
             break
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+        frames += 1
+        faces, _ = detector.detect(frame, track)
 
+        if enroll.offer(frame, faces) is None and on_progress:
+            on_progress(enroll.count, max_images)
         for (x, y, w, h) in faces:
-            roi = frame[y:y+h, x:x+w]
-            resized = cv2.resize(roi, (50, 50))
-            file_path = os.path.join(folder, f"{count}.jpg")
-            cv2.imwrite(file_path, resized)
-            count += 1
             cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.putText(frame, f"Captured: {count}/{max_images}", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        cv2.putText(frame, f"Captured: {enroll.count}/{max_images}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
 
         cv2.imshow("Register Face", frame)
         if cv2.waitKey(1) == 27:
@@ -81,6 +83,8 @@ def capture_faces(folder, max_images=50):
 
     cap.release()
     cv2.destroyAllWindows()
+    enroll.close()
+    return enroll.count, dict(enroll.rejected)
 
 # --------------------------
 # Root + Auth Routes
@@ -132,25 +136,22 @@ def register_face():
             flash("❌ User not found. Please add the user first.", "warning")
             return redirect(url_for('register_face'))
 
-        # Ensure roll is not already used in any folder
-        face_dir = 'static/faces'
-        existing_rolls = [folder for folder in os.listdir(face_dir) if folder.endswith(f"_{roll}")]
-        if existing_rolls:
+        # Ensure roll is not already used (unique index on identity.roll)
+        folder_name = f"{username}_{roll}"
+        if identities.roll_taken(roll) or identities.reserve(folder_name) is None:
             flash("⚠️ This roll number is already registered with another user.", "danger")
             return redirect(url_for('register_face'))
 
         # Proceed to register
-        folder_name = f"{username}_{roll}"
-        folder_path = os.path.join(face_dir, folder_name)
+        folder_path = os.path.join('static/faces', folder_name)
         os.makedirs(folder_path, exist_ok=True)
 
-        capture_faces(folder_path)
-        train_model()
-
-        flash(f"✅ Face registered for {folder_name} and model retrained.", "success")
+        # Capture and training run in the background worker (worker.py)
+        job = jobs.enqueue('enroll', folder_name)
+        flash(f"📸 Enrollment job #{job.id} queued for {folder_name}. The model is retrained when capture finishes.", "success")
         return redirect(url_for('register_face'))
 
-    return render_template('register_face.html')
+    return render_template('register_face.html', jobs=jobs.recent(10))
 
 
 
@@ -163,28 +164,18 @@ def admin_dashboard():
         flash("Access denied", "danger")
         return redirect(url_for('login'))
 
-    query = request.args.get('q')
-    page = request.args.get('page', 1, type=int)
-    per_page = 10
-
-    if query:
-        users = User.query.filter(User.username.ilike(f"%{query}%")).all()
-        pagination = None
-    else:
-        pagination = User.query.paginate(page=page, per_page=per_page, error_out=False)
-        users = pagination.items
-
-    # Count roles
-    counts = {'admin': 0, 'user': 0}
-    for u in User.query.all():
-        counts[u.role] += 1
+    query = (request.args.get('q') or '').strip()
+    after = request.args.get('after')
+    users_page, next_after = users.directory_page(query, after)
+    counts = users.role_counts()
 
     return render_template(
         'admin_dashboard.html',
-        users=users,
-        total_users=User.query.count(),
+        users=users_page,
+        total_users=sum(counts.values()),
         role_counts=counts,
-        pagination=pagination,
+        next_after=next_after,
+        after=after,
         query=query
     )
 
@@ -281,20 +272,12 @@ def home():
     if 'user' not in session:
         return redirect(url_for('login'))
 
-    today_str = date.today().strftime("%m_%d_%y")
-    path = f"Attendance/Attendance-{today_str}.csv"
-    if not os.path.exists(path):
-        with open(path, 'w') as f:
-            f.write("Name,Roll,Time\n")
-
-    names, rolls, times = [], [], []
-    if os.path.exists(path) and os.stat(path).st_size > 0:
-        df = pd.read_csv(path)
-        names = df['Name'].tolist()
-        rolls = df['Roll'].tolist()
-        times = df['Time'].tolist()
+    records = records_for_day(date.today())
+    names = [r.name for r in records]
+    rolls = [r.roll for r in records]
+    times = [r.time.strftime("%H:%M:%S") for r in records]
 
-    totalreg = len(os.listdir('static/faces'))
+    totalreg = identities.count()
     return render_template('home.html', names=names, rolls=rolls, times=times, l=len(names), totalreg=totalreg)
 
 # --------------------------
@@ -310,11 +293,13 @@ def analytics():
     if request.method == 'POST':
         try:
             selected_date = request.form.get('selected_date')
-            file_path = f"Attendance/Attendance-{pd.to_datetime(selected_date).strftime('%m_%d_%y')}.csv"
-            if os.path.exists(file_path) and os.stat(file_path).st_size > 0:
-                df = pd.read_csv(file_path)
-                records = df.to_dict(orient='records')
-                summary = df['Name'].value_counts()
+            day = datetime.strptime(selected_date, "%Y-%m-%d").date()
+            records = [
+                {'Name': r.name, 'Roll': r.roll, 'Time': r.time.strftime("%H:%M:%S")}
+                for r in records_for_day(day)
+            ]
+            if records:
+                summary = pd.Series([r['Name'] for r in records]).value_counts()
                 names, counts = list(summary.index), list(map(int, summary.values))
             else:
                 flash("No data found.", "warning")
@@ -323,6 +308,30 @@ def analytics():
 
     return render_template('analytics.html', names=names, counts=counts, selected_date=selected_date, records=records)
 
+
+@app.route('/analytics/range')
+def analytics_range():
+    if 'user' not in session or session['role'] != 'admin':
+        flash("Access denied", "danger")
+        return redirect(url_for('login'))
+
+    period = request.args.get('period', 'week')
+    try:
+        if period == 'custom':
+            start = datetime.strptime(request.args.get('from', ''), "%Y-%m-%d").date()
+            end = datetime.strptime(request.args.get('to', ''), "%Y-%m-%d").date()
+        else:
+            start, end = rollups.period_bounds(period)
+    except ValueError:
+        flash("Please choose a valid date range.", "warning")
+        period = 'week'
+        start, end = rollups.period_bounds(period)
+    if start > end:
+        start, end = end, start
+
+    return render_template('analytics_range.html', period=period, start=start, end=end,
+                           summary=rollups.summary(start, end))
+
 # --------------------------
 # Add User (Admin Only)
 # --------------------------
@@ -350,6 +359,45 @@ def add_user():
     return render_template('add_user.html')
 
 
+# --------------------------
+# Bulk user import (CSV)
+# --------------------------
+@app.route('/bulk-users', methods=['GET', 'POST'])
+def bulk_users():
+    if 'user' not in session or session['role'] != 'admin':
+        flash("Access denied", "danger")
+        return redirect(url_for('login'))
+
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename.lower().endswith('.csv'):
+            flash("❌ Choose a .csv file with username, password and (optional) role columns.", "danger")
+            return redirect(url_for('bulk_users'))
+        # Hashing thousands of passwords takes minutes: the job worker does it
+        os.makedirs(users.IMPORTS_DIR, exist_ok=True)
+        name = f"{uuid.uuid4().hex}.csv"
+        upload.save(os.path.join(users.IMPORTS_DIR, name))
+        job = jobs.enqueue('import_users', source=name)
+        flash(f"📥 Import job #{job.id} queued for {upload.filename}.", "success")
+        return redirect(url_for('bulk_users'))
+
+    imports = jobs.recent(10, kinds=('import_users',))
+    with_errors = {job.id for job in imports if os.path.exists(users.errors_path(job.id))}
+    return render_template('bulk_users.html', jobs=imports, with_errors=with_errors)
+
+
+@app.route('/bulk-users/<int:job_id>/errors.csv')
+def bulk_user_errors(job_id):
+    if 'user' not in session or session['role'] != 'admin':
+        flash("Access denied", "danger")
+        return redirect(url_for('login'))
+    path = users.errors_path(job_id)
+    if not os.path.exists(path):
+        flash("❌ No errors recorded for that import.", "warning")
+        return redirect(url_for('bulk_users'))
+    return send_file(path, mimetype='text/csv', as_attachment=True, download_name=f"import-{job_id}-errors.csv")
+
+
 # --------------------------
 # User Attendance History
 # --------------------------
@@ -358,17 +406,28 @@ def my_history():
     if 'user' not in session or session['role'] == 'admin':
         return redirect(url_for('login'))
 
-    user = session['user']
-    records = []
-    for file in sorted(glob('Attendance/Attendance-*.csv')):
-        if os.stat(file).st_size > 0:
-            df = pd.read_csv(file)
-            filtered = df[df['Name'].astype(str).str.startswith(user + '_')]
-            if not filtered.empty:
-                date_str = file.split('-')[-1].split('.')[0]
-                filtered['Date'] = pd.to_datetime(date_str, format="%m_%d_%y").strftime("%d-%b-%Y")
-                records.extend(filtered.to_dict(orient='records'))
-    return render_template('my_history.html', records=records)
+    def parse_day(value):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date() if value else None
+        except ValueError:
+            return None
+
+    start, end = parse_day(request.args.get('from')), parse_day(request.args.get('to'))
+    before = parse_day(request.args.get('before'))
+    rows, next_before = history_for(session['user'], start, end, before, limit=30)
+    records = [
+        {'Date': r.date.strftime("%d-%b-%Y"), 'Roll': r.roll, 'Time': r.time.strftime("%H:%M:%S")}
+        for r in rows
+    ]
+    return render_template(
+        'my_history.html',
+        records=records,
+        total=history_count(session['user'], start, end),
+        start=start,
+        end=end,
+        before=before,
+        next_before=next_before,
+    )
 
 # --------------------------
 # Public Attendance Marking Page
@@ -379,159 +438,112 @@ def public_home():
 
 @app.route('/mark-attendance')
 def mark_attendance():
-    import winsound  # ✅ Beep sound (Windows only)
-
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    model = joblib.load('static/face_recognition_model.pkl')
+    # Kiosk page: the browser streams webcam frames to /api/recognize
+    return render_template('mark_attendance.html')
 
-    cap = cv2.VideoCapture(0)
-    recognized = False
-    matched_user = None
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-
-        for (x, y, w, h) in faces:
-            roi = frame[y:y+h, x:x+w]
-            resized = cv2.resize(roi, (50, 50)).flatten().reshape(1, -1)
-
-            try:
-                prediction = model.predict(resized)[0]
-                matched_user = prediction
-                recognized = True
-
-                if log_attendance(matched_user):
-                    flash(f"✅ Attendance marked for {matched_user}.", "success")
-                    winsound.Beep(1000, 200)
-                    cv2.putText(frame, f"{matched_user} - Marked", (x, y - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-                else:
-                    flash(f"⚠️ Attendance already marked for {matched_user}.", "warning")
-                    cv2.putText(frame, f"{matched_user} - Already Marked", (x, y - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 165, 255), 2)
+@app.route('/api/recognize', methods=['POST'])
+def api_recognize():
+    if request.files:
+        uploads = request.files.getlist('frame') + request.files.getlist('frames')
+        blobs = [f.read() for f in uploads]
+    else:
+        blobs = [request.get_data()]
 
-                cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 3)
-                break
+    frames = [decode_frame(blob) for blob in blobs]
+    if not frames or any(frame is None for frame in frames):
+        return jsonify(error="Send one or more JPEG frames."), 400
+    if registry.model() is None:
+        return jsonify(error="No trained face model found."), 503
 
-            except Exception as e:
-                print("Prediction error:", e)
+    # Kiosks identify themselves so faces can be tracked across their frames
+    kiosk = request.headers.get('X-Kiosk-Id') or request.args.get('kiosk')
+    try:
+        futures = recognition_pool.submit(frames, tracks.get(kiosk) if kiosk else None)
+    except PoolBusy:
+        return jsonify(error="Recognition busy, retry shortly."), 503, {'Retry-After': '1'}
+
+    metrics.inc(metrics.SCANS, amount=len(frames))
+    mark = request.args.get('mark', '1') != '0'
+    results = []
+    for future in futures:
+        faces = future.result()
+        for face in faces:
+            outcome = 'pending' if face['identity'] is None else 'unknown' if face['identity'] == UNKNOWN else 'committed'
+            metrics.inc(metrics.FACES, outcome)
+        if mark:
+            for face in faces:
+                if face['identity'] in (None, UNKNOWN):
+                    continue  # still voting, or not confident enough to mark
+                face['status'] = 'marked' if log_attendance(face['identity']) else 'already_marked'
+        results.append({'faces': faces})
+
+    return jsonify(model_version=registry.stats()['version'], frames=results)
+
+
+@app.route('/model-status')
+def model_status():
+    if 'user' not in session or session['role'] != 'admin':
+        return jsonify(error="Access denied"), 403
+    return jsonify(registry.stats())
 
-        if not recognized:
-            cv2.putText(frame, "Capturing... Please hold still", (10, 450),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
 
-        cv2.imshow("Face Attendance", frame)
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus scrape target, summed over every gunicorn worker
+    if not metrics.ENABLED:
+        return "Metrics are disabled.", 404
+    body, content_type = metrics.render()
+    return body, 200, {'Content-Type': content_type}
 
-        if recognized or cv2.waitKey(1) == 27:
-            break
 
-    cap.release()
-    cv2.destroyAllWindows()
-    return redirect(url_for('public_home'))
+@app.route('/recognition-stats')
+def recognition_stats():
+    if 'user' not in session or session['role'] != 'admin':
+        return jsonify(error="Access denied"), 403
+    return jsonify(dict(batcher.stats(), detection=detector.stats()))
 
 
 # --------------------------
-# Helper: Log Attendance
+# Export PDF-Execl
 # --------------------------
-def log_attendance(username):
-    from datetime import datetime
-    today = datetime.today().strftime("%m_%d_%y")
-    now = datetime.now().strftime("%H:%M:%S")
-    path = f"Attendance/Attendance-{today}.csv"
-
-    if not os.path.exists(path):
-        with open(path, 'w') as f:
-            f.write("Name,Roll,Time\n")
-
-    df = pd.read_csv(path)
-    # Prevent duplicate entry for today
-    if username in df['Name'].astype(str).tolist():
-        return False  # Already marked today
+def export_range():
+    # A single day from the analytics page, or a from/to range
+    selected_date = request.form.get('selected_date')
+    start = request.form.get('from') or selected_date
+    end = request.form.get('to') or selected_date
+    return datetime.strptime(start, "%Y-%m-%d").date(), datetime.strptime(end, "%Y-%m-%d").date()
 
-    roll = username.split('_')[1]
-    with open(path, 'a') as f:
-        f.write(f"{username},{roll},{now}\n")
-    return True  # Marked successfully
 
-# --------------------------
-# Export PDF-Execl
-# --------------------------
-@app.route('/export-excel', methods=['POST'])
-def export_excel():
+def send_export(kind, mimetype):
     if 'user' not in session or session['role'] != 'admin':
         flash("Access denied", "danger")
         return redirect(url_for('login'))
 
-    selected_date = request.form.get('selected_date')
     try:
-        file_path = f"Attendance/Attendance-{pd.to_datetime(selected_date).strftime('%m_%d_%y')}.csv"
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-            output_path = f"Attendance/Export-{selected_date}.xlsx"
-            df.to_excel(output_path, index=False)
-            return send_from_directory('Attendance', os.path.basename(output_path), as_attachment=True)
+        start, end = export_range()
+        path = exports.export_file(kind, min(start, end), max(start, end))
+        if path:
+            name = f"Attendance-{start}.{kind}" if start == end else f"Attendance-{start}_to_{end}.{kind}"
+            response = send_file(path, mimetype=mimetype, as_attachment=True, download_name=name, conditional=True)
+            response.cache_control.private = True
+            response.cache_control.max_age = 300
+            return response
         else:
-            flash("File not found.", "danger")
+            flash("No data found.", "danger")
     except Exception as e:
         flash(f"Error exporting: {e}", "danger")
 
-    return redirect(url_for('analytics'))
-
-@app.route('/export-pdf', methods=['POST'])
-def export_pdf():
-    if 'user' not in session or session['role'] != 'admin':
-        flash("Access denied", "danger")
-        return redirect(url_for('login'))
+    return redirect(request.referrer or url_for('analytics'))
 
-    from reportlab.lib.pagesizes import A4
-    from reportlab.pdfgen import canvas
 
-    selected_date = request.form.get('selected_date')
-    try:
-        file_path = f"Attendance/Attendance-{pd.to_datetime(selected_date).strftime('%m_%d_%y')}.csv"
-        pdf_path = f"Attendance/Export-{selected_date}.pdf"
-
-        if os.path.exists(file_path):
-            df = pd.read_csv(file_path)
-            c = canvas.Canvas(pdf_path, pagesize=A4)
-            width, height = A4
-
-            c.setFont("Helvetica-Bold", 14)
-            c.drawString(180, height - 50, f"Attendance Report - {selected_date}")
-            c.setFont("Helvetica", 12)
-            c.drawString(50, height - 80, "Generated by Smart Attendance System")
-
-            # Table headers
-            y = height - 120
-            c.setFont("Helvetica-Bold", 12)
-            c.drawString(50, y, "Name")
-            c.drawString(250, y, "Roll")
-            c.drawString(400, y, "Time")
-
-            c.setFont("Helvetica", 11)
-            y -= 20
-            for _, row in df.iterrows():
-                if y < 50:  # page break
-                    c.showPage()
-                    y = height - 50
-                c.drawString(50, y, str(row['Name']))
-                c.drawString(250, y, str(row['Roll']))
-                c.drawString(400, y, str(row['Time']))
-                y -= 20
-
-            c.save()
-            return send_from_directory('Attendance', os.path.basename(pdf_path), as_attachment=True)
-        else:
-            flash("File not found.", "danger")
-    except Exception as e:
-        flash(f"Error exporting PDF: {e}", "danger")
+@app.route('/export-excel', methods=['POST'])
+def export_excel():
+    return send_export('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
 
-    return redirect(url_for('analytics'))
+@app.route('/export-pdf', methods=['POST'])
+def export_pdf():
+    return send_export('pdf', 'application/pdf')
 
 
 # --------------------------
@@ -543,24 +555,29 @@ def registered_faces():
         flash("Access denied", "danger")
         return redirect(url_for('login'))
 
-    face_data = []
-    base_path = 'static/faces'
-
-    if os.path.exists(base_path):
-        for folder in os.listdir(base_path):
-            folder_path = os.path.join(base_path, folder)
-            if os.path.isdir(folder_path):
-                images = [
-                    f"{folder}/{img}"
-                    for img in os.listdir(folder_path)
-                    if img.endswith(".jpg")
-                ]
-                face_data.append({
-                    'user': folder,
-                    'images': images[:5]  # show up to 5 previews
-                })
-
-    return render_template('registered_faces.html', face_data=face_data)
+    pagination = identities.page(request.args.get('page', 1, type=int))
+    face_data = [
+        {'user': identity.name, 'thumbnails': len(identity.thumbnails), 'count': identity.image_count,
+         'trained': identity.trained_version, 'version': identity.sprite_version}
+        for identity in pagination.items
+    ]
+    return render_template('registered_faces.html', face_data=face_data, pagination=pagination)
+
+
+@app.route('/face-sprite/<name>.jpg')
+def face_sprite(name):
+    if 'user' not in session or session['role'] != 'admin':
+        return "Access denied", 403
+    path = sprites.sprite_path(name)
+    if os.path.dirname(os.path.normpath(path)) != os.path.normpath(sprites.SPRITES_DIR) or not os.path.exists(path):
+        return "Not found", 404
+    # The page links with ?v=<identity update time>, so the URL changes
+    # whenever the strip is rebuilt; ETag covers revalidation.
+    response = send_file(path, mimetype='image/jpeg', conditional=True, etag=True, max_age=31536000)
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    return response
 # ==================
 # delete user 
 # ==================
@@ -574,8 +591,10 @@ def delete_face(username):
     if os.path.exists(folder_path):
         import shutil
         shutil.rmtree(folder_path)
-        train_model()  # Retrain model after deletion
-        flash(f"Deleted face data for {username}", "success")
+        face_store.remove_identity(username)
+        identities.remove(username)
+        job = jobs.enqueue('retrain')  # Retrain model after deletion
+        flash(f"Deleted face data for {username}. Retraining in job #{job.id}.", "success")
     else:
         flash("Folder not found.", "warning")
 
@@ -591,25 +610,66 @@ def download_face_zip(username):
         flash("Access denied", "danger")
         return redirect(url_for('login'))
 
-    folder_path = os.path.join('static/faces', username)
-    zip_path = os.path.join('static/faces', f"{username}.zip")
+    if Identity.query.filter_by(name=username).first() is None:
+        flash("❌ Folder not found.", "danger")
+        return redirect(url_for('registered_faces'))
+    return zip_response(face_export.iter_zip([username], prefix_names=False), f"{username}.zip")
 
-    if os.path.exists(zip_path):
-        os.remove(zip_path)  # Remove old zip if exists
 
-    if os.path.exists(folder_path):
-        import zipfile
-        with zipfile.ZipFile(zip_path, 'w') as zipf:
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    zipf.write(file_path, os.path.relpath(file_path, folder_path))
-
-        return send_from_directory('static/faces', f"{username}.zip", as_attachment=True)
-    else:
-        flash("❌ Folder not found.", "danger")
+@app.route('/download-faces')
+def download_faces_zip():
+    # ?name=<a>&name=<b> for a selection, or ?all=1 for the whole dataset
+    if 'user' not in session or session['role'] != 'admin':
+        flash("Access denied", "danger")
+        return redirect(url_for('login'))
+
+    query = Identity.query.order_by(Identity.name)
+    selected = request.args.getlist('name')
+    export_all = request.args.get('all') == '1'
+    if not selected and not export_all:
+        flash("❌ No face data selected.", "warning")
         return redirect(url_for('registered_faces'))
+    if not export_all:
+        query = query.filter(Identity.name.in_(selected))
+    names = [identity.name for identity in query]
+    if not names:
+        flash("❌ No face data selected.", "warning")
+        return redirect(url_for('registered_faces'))
+    filename = f"faces-{date.today()}.zip" if export_all else f"faces-{len(names)}-people.zip"
+    return zip_response(face_export.iter_zip(names), filename)
+
+
+def zip_response(chunks, filename):
+    # Streamed as it is built: no temp file, no Content-Length
+    return Response(chunks, mimetype='application/zip',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+# ==================
+# Training jobs (Admin Only)
+# ==================
+@app.route('/jobs')
+def job_list():
+    if 'user' not in session or session['role'] != 'admin':
+        return jsonify(error="Access denied"), 403
+    kinds = request.args.getlist('kind') or jobs.TRAINING_KINDS
+    return jsonify(jobs=[job.to_dict() for job in jobs.recent(20, kinds)])
+
+
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    if 'user' not in session or session['role'] != 'admin':
+        return jsonify(error="Access denied"), 403
+    job = db.session.get(TrainingJob, job_id)
+    if job is None:
+        return jsonify(error="Job not found"), 404
+    return jsonify(job.to_dict())
+
 
 # Application entry
 if __name__ == '__main__':
+    # In development run the job worker in-process (only in the reloader's
+    # serving child); in production run `python worker.py` separately.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        import threading, worker
+        threading.Thread(target=worker.run, args=(app, train_model, capture_faces), daemon=True).start()
     app.run(debug=True)
\ No newline at end of file
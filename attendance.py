@@ -0,0 +1,228 @@
+import csv
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+from glob import glob
+from sqlalchemy.dialects.sqlite import insert
+import metrics
+from models import db, AttendanceRecord
+import rollups
+
+# --------------------------
+# Attendance store (SQLite)
+# --------------------------
+# Attendance lives in the ``attendance_record`` table. The unique
+# (username, date) index rejects a second mark for the same day without
+# reading any existing rows, so exactly one row per person per day survives
+# any number of concurrent writers. All marks go through AttendanceWriter,
+# which groups bursts into a single transaction (one commit/fsync per group).
+
+CSV_NAME = re.compile(r'Attendance-(\d{2}_\d{2}_\d{2})\.csv$')
+
+
+def split_identity(identity):
+    # Face folders are named "<username>_<roll>"; usernames may contain "_"
+    username, _, roll = identity.rpartition('_')
+    return (username, roll) if username else (identity, '')
+
+
+class PresenceCache:
+    """Per-process set of usernames already marked today.
+
+    Warmed from the table once per day; repeat scans of someone already marked
+    return before any database I/O. Marks made by other workers are learnt
+    from the unique-index rejection on their first repeat scan here.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._day = None
+        self._marked = set()
+        self.hits = 0
+        self.misses = 0
+
+    def _roll_over(self, day):
+        if day != self._day:
+            rows = db.session.query(AttendanceRecord.username).filter_by(date=day)
+            self._marked = {username for (username,) in rows}
+            self._day = day
+
+    def seen(self, username, day):
+        with self._lock:
+            self._roll_over(day)
+            if username in self._marked:
+                self.hits += 1
+                metrics.cache('presence', True)
+                return True
+            self.misses += 1
+            metrics.cache('presence', False)
+            return False
+
+    def add(self, username, day):
+        with self._lock:
+            if day == self._day:
+                self._marked.add(username)
+
+
+class AttendanceWriter:
+    def __init__(self, window_ms=10, max_batch=200):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.app = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.commits = 0
+        self.rows = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.window = app.config.get('ATTENDANCE_COMMIT_WINDOW_MS', self.window * 1000) / 1000
+        self.max_batch = app.config.get('ATTENDANCE_COMMIT_MAX', self.max_batch)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+                    self._thread.start()
+
+    def write(self, row):
+        """Blocking: insert one attendance row; False if that person/day exists."""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((row, future))
+        return future.result()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            engine = db.engine
+        stmt = insert(AttendanceRecord.__table__).on_conflict_do_nothing(index_elements=['username', 'date'])
+        while True:
+            batch = self._collect()
+            try:
+                with metrics.timer('commit'), engine.begin() as conn:
+                    results = []
+                    for row, _ in batch:
+                        inserted = conn.execute(stmt, row).rowcount == 1
+                        if inserted:
+                            rollups.record(conn, row)
+                        results.append(inserted)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.commits += 1
+            self.rows += sum(results)
+            for (_, future), inserted in zip(batch, results):
+                future.set_result(inserted)
+
+
+presence = PresenceCache()
+writer = AttendanceWriter()
+
+
+@metrics.timed('mark')
+def log_attendance(identity, when=None):
+    """Mark ``identity`` present; False if already marked that day."""
+    when = when or datetime.now()
+    day = when.date()
+    username, roll = split_identity(identity)
+    if presence.seen(username, day):
+        metrics.inc(metrics.MARKS, 'duplicate')
+        return False  # Already marked today
+
+    # False here means another worker marked them first
+    marked = writer.write({'username': username, 'roll': roll, 'date': day, 'time': when.time().replace(microsecond=0)})
+    presence.add(username, day)
+    metrics.inc(metrics.MARKS, 'marked' if marked else 'duplicate')
+    return marked
+
+
+def records_for_day(day):
+    return AttendanceRecord.query.filter_by(date=day).order_by(AttendanceRecord.time).all()
+
+
+def _history_query(username, start=None, end=None):
+    # Served entirely from the (username, date) unique index, so cost depends
+    # on this user's records, not on how many days the system has run.
+    query = AttendanceRecord.query.filter(AttendanceRecord.username == username)
+    if start:
+        query = query.filter(AttendanceRecord.date >= start)
+    if end:
+        query = query.filter(AttendanceRecord.date <= end)
+    return query
+
+
+def history_for(username, start=None, end=None, before=None, limit=30):
+    """Newest-first page of one user's marks.
+
+    Keyset pagination: pass the returned ``next_before`` date back as
+    ``before`` to get the following page. ``next_before`` is None on the
+    last page.
+    """
+    query = _history_query(username, start, end)
+    if before:
+        query = query.filter(AttendanceRecord.date < before)
+    rows = query.order_by(AttendanceRecord.date.desc()).limit(limit + 1).all()
+    next_before = rows[limit - 1].date if len(rows) > limit else None
+    return rows[:limit], next_before
+
+
+def history_count(username, start=None, end=None):
+    return _history_query(username, start, end).count()
+
+
+# --------------------------
+# One-shot importer for the legacy Attendance/*.csv files
+# --------------------------
+def read_csv_day(path):
+    match = CSV_NAME.search(os.path.basename(path))
+    if not match:
+        return None, []
+    day = datetime.strptime(match.group(1), "%m_%d_%y").date()
+    rows = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            if not row.get('Name'):
+                continue
+            username, roll = split_identity(row['Name'].strip())
+            rows.append({
+                'username': username,
+                'roll': roll,
+                'date': day,
+                'time': datetime.strptime(row['Time'].strip(), "%H:%M:%S").time(),
+            })
+    return day, rows
+
+
+def import_csv_files(folder='Attendance'):
+    """Load every Attendance-MM_DD_YY.csv; duplicates are skipped by the unique index."""
+    imported = skipped = 0
+    for path in sorted(glob(os.path.join(folder, 'Attendance-*.csv'))):
+        day, rows = read_csv_day(path)
+        if day is None or not rows:
+            continue
+        result = db.session.connection().execute(
+            insert(AttendanceRecord.__table__).on_conflict_do_nothing(index_elements=['username', 'date']),
+            rows,
+        )
+        imported += result.rowcount
+        skipped += len(rows) - result.rowcount
+    db.session.commit()
+    return imported, skipped
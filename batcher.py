@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from model_registry import registry
+
+# --------------------------
+# Micro-batching in front of the matcher
+# --------------------------
+# Face crops from concurrent requests are collected for up to ``window_ms``
+# (or until ``max_batch`` crops are waiting) and matched with a single
+# batched call, then each caller gets its own slice of the results back.
+# Callers pass the model they fetched, so their distances always come from
+# the model (and feature extractor) they threshold with, even across a hot
+# swap; crops for different models are matched separately.
+
+
+class MicroBatcher:
+    def __init__(self, window_ms=5, max_batch=64):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {'batches': 0, 'requests': 0, 'crops': 0, 'last_batch_size': 0,
+                       'max_batch_size': 0, 'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+
+    def _ensure_thread(self):
+        # Started lazily so the thread lives in the serving process, not a
+        # pre-fork master.
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                    self._thread.start()
+
+    def match(self, crops, model=None):
+        """Blocking: return one ``matcher.Match`` per crop row, scored by ``model`` (default: current)."""
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((np.asarray(crops), model or registry.model(), future, time.perf_counter()))
+        return future.result()
+
+    def _collect(self):
+        first = self._queue.get()
+        batch, size = [first], len(first[0])
+        deadline = first[3] + self.window
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch, size
+
+    def _run(self):
+        while True:
+            batch, size = self._collect()
+            started = time.perf_counter()
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[1]), []).append(item)
+            for group in groups.values():
+                self._match(group)
+
+            waits = [started - enqueued for _, _, _, enqueued in batch]
+            with self._lock:
+                s = self._stats
+                s['batches'] += 1
+                s['requests'] += len(batch)
+                s['crops'] += size
+                s['last_batch_size'] = size
+                s['max_batch_size'] = max(s['max_batch_size'], size)
+                s['total_wait_seconds'] += sum(waits)
+                s['max_wait_seconds'] = max(s['max_wait_seconds'], max(waits))
+
+    def _match(self, group):
+        try:
+            matches = group[0][1].match(np.concatenate([crops for crops, _, _, _ in group]))
+        except Exception as e:
+            for _, _, future, _ in group:
+                future.set_exception(e)
+            return
+        offset = 0
+        for crops, _, future, _ in group:
+            future.set_result(matches[offset:offset + len(crops)])
+            offset += len(crops)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        s['queue_depth'] = self._queue.qsize()
+        s['mean_batch_size'] = s['crops'] / s['batches'] if s['batches'] else 0.0
+        s['mean_wait_seconds'] = s['total_wait_seconds'] / s['requests'] if s['requests'] else 0.0
+        s['window_ms'] = self.window * 1000
+        s['max_batch'] = self.max_batch
+        return s
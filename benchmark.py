@@ -0,0 +1,233 @@
+# benchmark.py
+# Times the recognition and attendance hot paths against synthetic data in a
+# throwaway directory: N identities x 50 face JPEGs (50x50, as capture_faces
+# writes them) and several years of Attendance-MM_DD_YY.csv history. Results
+# are printed and written as JSON so runs can be compared over time.
+#
+#   python benchmark.py --identities 200 --people 300 --years 2 --out bench.json
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import cv2
+import numpy as np
+
+
+def timed(fn, repeat=1):
+    """Run ``fn`` ``repeat`` times; latency summary in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'runs': repeat,
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'p50_ms': round(samples[len(samples) // 2], 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'min_ms': round(samples[0], 3),
+    }
+
+
+# --------------------------
+# Synthetic data
+# --------------------------
+def generate_faces(faces_dir, identities, images, seed=0):
+    # Each identity is a random base image; its samples are noisy copies of it
+    rng = np.random.default_rng(seed)
+    for i in range(identities):
+        folder = os.path.join(faces_dir, f"Person{i}_{100000 + i}")
+        os.makedirs(folder, exist_ok=True)
+        base = rng.integers(0, 256, (50, 50, 3)).astype(np.int16)
+        for n in range(images):
+            noise = rng.integers(-20, 21, base.shape)
+            cv2.imwrite(os.path.join(folder, f"{n}.jpg"), np.clip(base + noise, 0, 255).astype(np.uint8))
+
+
+def generate_history(folder, people, years, present=0.8, seed=0):
+    """Weekday CSV files for ``years`` years ending yesterday; returns (first_day, last_day)."""
+    rng = np.random.default_rng(seed)
+    os.makedirs(folder, exist_ok=True)
+    last = date.today() - timedelta(days=1)
+    first = last - timedelta(days=365 * years)
+    day = first
+    while day <= last:
+        if day.weekday() < 5:
+            with open(os.path.join(folder, f"Attendance-{day.strftime('%m_%d_%y')}.csv"), 'w') as f:
+                f.write("Name,Time\n")
+                for p in np.flatnonzero(rng.random(people) < present):
+                    f.write(f"Student{p}_{200000 + p},{8 + p % 2:02d}:{p % 60:02d}:{p % 59:02d}\n")
+        day += timedelta(days=1)
+    return first, last
+
+
+# --------------------------
+# Benchmarks
+# --------------------------
+def bench_training(faces_dir, features_dir, model_dir, extractor):
+    import face_store
+    import model_store
+
+    def train():
+        face_store.sync(faces_dir, features_dir)
+        data, labels = face_store.load_features(features_dir)
+        model_store.save_model(data, labels, model_dir, extractor=extractor)
+
+    results = {}
+    started = time.perf_counter()
+    decoded = face_store.rebuild(faces_dir, features_dir)
+    results['decode_features'] = {'images': decoded, 'ms': round((time.perf_counter() - started) * 1000, 3)}
+    results['train'] = timed(train)
+    results['retrain_unchanged'] = timed(train, 3)
+    return results
+
+
+def bench_features(features_dir):
+    import face_store
+    import features
+
+    data, _ = face_store.load_features(features_dir)
+    results = {}
+    for name in features.EXTRACTORS:
+        extractor = features.make_extractor(name).fit(data)
+        run = timed(lambda: extractor.transform(data), 3)
+        results[name] = {'dim': extractor.dim, 'us_per_sample': round(run['mean_ms'] * 1000 / len(data), 2)}
+    return results
+
+
+def bench_prediction(model_dir, features_dir, queries=200):
+    import face_store
+    import model_store
+    from config import Config
+
+    data, _ = face_store.load_features(features_dir)
+    rng = np.random.default_rng(1)
+    crops = data[rng.integers(0, len(data), queries)]
+    results = {}
+    for backend in ('exact', 'centroid', 'ivf'):
+        model = model_store.load_model(model_dir, backend=backend, **Config.MATCHER_PARAMS.get(backend, {}))
+        single = timed(lambda: [model.match(crop[None]) for crop in crops])
+        batched = timed(lambda: model.match(crops), 3)
+        results[backend] = {
+            'single_ms_per_query': round(single['mean_ms'] / queries, 3),
+            'batched_ms_per_query': round(batched['mean_ms'] / queries, 3),
+            'batched_queries_per_s': round(queries / batched['mean_ms'] * 1000),
+        }
+    return results
+
+
+def bench_attendance(app, history_dir, people, threads, first, last):
+    import exports
+    import rollups
+    from attendance import history_for, history_count, import_csv_files, log_attendance, records_for_day
+
+    results = {}
+    with app.app_context():
+        started = time.perf_counter()
+        imported, _ = import_csv_files(history_dir)
+        rollups.rebuild()
+        results['import_history'] = {'rows': imported, 'ms': round((time.perf_counter() - started) * 1000, 3)}
+
+    # Everyone marks twice (the second is a duplicate) from ``threads`` writers
+    when = datetime.combine(date.today(), datetime.min.time()).replace(hour=9)
+
+    def mark(i):
+        with app.app_context():
+            return log_attendance(f"Student{i % people}_{200000 + i % people}", when)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        marked = sum(pool.map(mark, range(people * 2)))
+    elapsed = time.perf_counter() - started
+    results['marks'] = {'attempts': people * 2, 'marked': marked, 'threads': threads,
+                        'marks_per_s': round(people * 2 / elapsed)}
+
+    with app.app_context():
+        user = "Student0"
+        _, next_before = history_for(user)
+        results['history_first_page'] = timed(lambda: history_for(user), 50)
+        results['history_next_page'] = timed(lambda: history_for(user, before=next_before), 50)
+        results['history_count'] = timed(lambda: history_count(user), 50)
+        results['records_for_day'] = timed(lambda: records_for_day(last), 20)
+        for period in ('week', 'month', 'semester'):
+            start, end = rollups.period_bounds(period, last)
+            results[f'summary_{period}'] = timed(lambda: rollups.summary(start, end), 10)
+        results['summary_full_range'] = timed(lambda: rollups.summary(first, last), 5)
+
+        export_dir = os.path.join(os.path.dirname(history_dir), 'exports')
+        month_start = rollups.month_start(last)
+        for kind in ('xlsx', 'pdf'):
+            results[f'export_{kind}_month'] = timed(lambda: exports.export_file(kind, month_start, last, export_dir))
+            results[f'export_{kind}_month_cached'] = timed(lambda: exports.export_file(kind, month_start, last, export_dir), 10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recognition and attendance hot paths.")
+    parser.add_argument('--identities', type=int, default=100, help="synthetic face identities")
+    parser.add_argument('--images', type=int, default=50, help="images per identity")
+    parser.add_argument('--people', type=int, default=300, help="people in the attendance history")
+    parser.add_argument('--years', type=int, default=2, help="years of attendance history")
+    parser.add_argument('--threads', type=int, default=8, help="concurrent attendance writers")
+    parser.add_argument('--extractor', default=None, help="feature extractor to train with (default: config)")
+    parser.add_argument('--out', default='benchmark.json', help="where to write the JSON results")
+    parser.add_argument('--keep', action='store_true', help="keep the generated data directory")
+    args = parser.parse_args()
+
+    from stress_attendance import make_app
+    from models import db
+
+    work = tempfile.mkdtemp(prefix='attendance-bench-')
+    faces_dir, features_dir, model_dir = (os.path.join(work, d) for d in ('faces', 'features', 'model'))
+    history_dir = os.path.join(work, 'Attendance')
+
+    print(f"🧪 Generating {args.identities} identities x {args.images} images and "
+          f"{args.years} years of history for {args.people} people in {work}")
+    generate_faces(faces_dir, args.identities, args.images)
+    first, last = generate_history(history_dir, args.people, args.years)
+
+    app = make_app(os.path.join(work, 'bench.db'))
+    with app.app_context():
+        db.create_all()
+
+    report = {
+        'params': vars(args),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+        },
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'results': {},
+    }
+    results = report['results']
+    from config import Config
+    args.extractor = args.extractor or Config.FEATURE_EXTRACTOR
+    results['training'] = bench_training(faces_dir, features_dir, model_dir, args.extractor)
+    results['features'] = bench_features(features_dir)
+    results['prediction'] = bench_prediction(model_dir, features_dir)
+    results['attendance'] = bench_attendance(app, history_dir, args.people, args.threads, first, last)
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    for group, entries in results.items():
+        print(f"\n== {group}")
+        for name, value in entries.items():
+            print(f"  {name:28} {json.dumps(value)}")
+    print(f"\n✅ Results written to {args.out}")
+    if not args.keep:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# bulk_users.py
+# Create many accounts from a CSV with username,password[,role] columns.
+# Passwords are hashed on a process pool and rows are inserted in batches;
+# rejected rows are listed (and optionally written to a CSV).
+#
+#   python bulk_users.py students.csv --workers 8 --errors rejected.csv
+import argparse
+import sys
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="Bulk-create user accounts from a CSV file.")
+    parser.add_argument('csv', help="CSV with username,password[,role] columns")
+    parser.add_argument('--workers', type=int, default=Config.IMPORT_WORKERS, help="password hashing processes")
+    parser.add_argument('--batch-size', type=int, default=Config.IMPORT_BATCH_SIZE, help="rows per transaction")
+    parser.add_argument('--errors', help="write rejected rows to this CSV")
+    args = parser.parse_args()
+
+    from app import app
+    import users
+
+    def progress(percent, message):
+        print(f"\r  {percent:5.1f}%  {message:40}", end='', flush=True)
+
+    with app.app_context(), open(args.csv, newline='', encoding='utf-8-sig') as f:
+        report = users.provision(f, args.workers, args.batch_size, on_progress=progress)
+    print()
+
+    for line, username, reason in report['errors']:
+        print(f"  ⚠️ line {line} {username!r}: {reason}")
+    if args.errors and report['errors']:
+        users.write_errors(report['errors'], args.errors)
+        print(f"  Rejected rows written to {args.errors}")
+    print(f"✅ {users.summary(report)} from {report['rows']} rows")
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,5 +4,61 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'fallback-key')
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'database/users.db')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'database/users.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Feature extractor for newly trained models (see features.py); a model
+    # always serves with the extractor it was trained with
+    FEATURE_EXTRACTOR = os.environ.get('FEATURE_EXTRACTOR', 'gray-eq-v1')
+
+    # Face matching backend: 'exact', 'centroid' or 'ivf' (see matcher.py)
+    MATCHER_BACKEND = os.environ.get('MATCHER_BACKEND', 'exact')
+    MATCHER_PARAMS = {
+        'centroid': {'shortlist': int(os.environ.get('MATCHER_SHORTLIST', 5))},
+        'ivf': {'nprobe': int(os.environ.get('MATCHER_NPROBE', 8))},
+    }
+
+    # Kiosk frame recognition (/api/recognize)
+    RECOGNITION_WORKERS = int(os.environ.get('RECOGNITION_WORKERS', os.cpu_count() or 2))
+    RECOGNITION_QUEUE = int(os.environ.get('RECOGNITION_QUEUE', 32))
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024
+
+    # Micro-batching of face crops across concurrent requests
+    BATCH_WINDOW_MS = float(os.environ.get('BATCH_WINDOW_MS', 5))
+    BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 64))
+
+    # Attendance writes are grouped into one transaction per commit window
+    ATTENDANCE_COMMIT_WINDOW_MS = float(os.environ.get('ATTENDANCE_COMMIT_WINDOW_MS', 10))
+    ATTENDANCE_COMMIT_MAX = int(os.environ.get('ATTENDANCE_COMMIT_MAX', 200))
+
+    # Enrollment capture keeps ENROLL_TARGET_SAMPLES sharp, distinct samples
+    # (see enrollment.py), giving up after ENROLL_MAX_FRAMES camera frames
+    ENROLL_TARGET_SAMPLES = int(os.environ.get('ENROLL_TARGET_SAMPLES', 30))
+    ENROLL_MAX_FRAMES = int(os.environ.get('ENROLL_MAX_FRAMES', 900))
+    ENROLL_MIN_SHARPNESS = float(os.environ.get('ENROLL_MIN_SHARPNESS', 100))
+    ENROLL_MIN_FACE = int(os.environ.get('ENROLL_MIN_FACE', 80))
+    ENROLL_DUPLICATE_DISTANCE = float(os.environ.get('ENROLL_DUPLICATE_DISTANCE', 0.005))
+
+    # Bulk user import (see users.py): password hashing processes and rows
+    # inserted per transaction
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', os.cpu_count() or 2))
+    IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', 500))
+
+    # Prometheus metrics on /metrics (see metrics.py); off makes timers no-ops
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+    # Face detection fast path (see detection.py): detect on a frame scaled to
+    # DETECT_WIDTH pixels wide, track faces between full passes, and skip
+    # recognition when the tracked faces moved less than the threshold
+    DETECT_WIDTH = int(os.environ.get('DETECT_WIDTH', 320))
+    DETECT_FULL_EVERY = int(os.environ.get('DETECT_FULL_EVERY', 10))
+    DETECT_ROI_MARGIN = float(os.environ.get('DETECT_ROI_MARGIN', 0.25))
+    DETECT_MOTION_THRESHOLD = float(os.environ.get('DETECT_MOTION_THRESHOLD', 4.0))
+
+    # Temporal voting: a tracked face is marked once VOTE_MIN_VOTES of the last
+    # VOTE_WINDOW frames agree with a median cosine distance within
+    # VOTE_MAX_DISTANCE (default: the model's feature extractor's threshold);
+    # otherwise it is reported as unknown
+    VOTE_WINDOW = int(os.environ.get('VOTE_WINDOW', 5))
+    VOTE_MIN_VOTES = int(os.environ.get('VOTE_MIN_VOTES', 3))
+    VOTE_MAX_DISTANCE = float(os.environ['VOTE_MAX_DISTANCE']) if os.environ.get('VOTE_MAX_DISTANCE') else None
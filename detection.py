@@ -0,0 +1,196 @@
+import threading
+import time
+from collections import OrderedDict
+import cv2
+import numpy as np
+import metrics
+
+# --------------------------
+# Face detection fast path
+# --------------------------
+# Haar detection on a full-resolution frame dominates kiosk CPU. FaceDetector
+# runs the cascade on a downscaled copy and maps boxes back to full size.
+# Given a Track (one per camera) it only searches a margin around the faces
+# found in the previous frame, falling back to a full-frame pass every
+# ``full_every`` frames or when a face is lost. It also flags frames where
+# the tracked faces have not changed, so callers can reuse the last result
+# instead of recognizing again. Each tracked face keeps a stable id (matched
+# by box overlap across full passes) so callers can attach per-face state.
+
+SIGNATURE_SIZE = (16, 16)
+ROI_SCALE_FACTOR = 1.2         # finer pyramid, affordable on a small region
+ROI_SIZE_RANGE = (0.6, 1.6)    # a tracked face stays within this size ratio
+MIN_OVERLAP = 0.3              # IoU for a re-detected box to keep its face id
+
+
+def overlap(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+class Track:
+    """Detection state carried between frames of one camera."""
+
+    def __init__(self):
+        self.lock = threading.Lock()  # one frame of this camera at a time
+        self.boxes = []
+        self.face_ids = []            # stable id per entry of ``boxes``
+        self.next_id = 0
+        self.since_full = None        # frames since the last full-frame pass
+        self.signature = None         # tiny grayscale thumbnails of the tracked faces
+        self.results = None           # caller's results for the current faces
+        self.results_key = None
+        self.sessions = {}            # caller's per-face state, keyed by face id
+        self.last_used = time.monotonic()
+
+    def assign_ids(self, boxes):
+        # Re-detected boxes inherit the id of the old box they overlap most
+        ids, free = [], dict(zip(self.face_ids, self.boxes))
+        for box in boxes:
+            best = max(free, key=lambda i: overlap(box, free[i]), default=None)
+            if best is not None and overlap(box, free[best]) >= MIN_OVERLAP:
+                ids.append(best)
+                del free[best]
+            else:
+                ids.append(self.next_id)
+                self.next_id += 1
+        return ids
+
+
+class TrackStore:
+    """Bounded map of kiosk id -> Track; idle tracks expire after ``ttl`` seconds."""
+
+    def __init__(self, max_tracks=256, ttl=30):
+        self.max_tracks = max_tracks
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._tracks = OrderedDict()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            track = self._tracks.pop(key, None)
+            if track is None or now - track.last_used > self.ttl:
+                track = Track()
+            track.last_used = now
+            self._tracks[key] = track
+            while len(self._tracks) > self.max_tracks:
+                self._tracks.popitem(last=False)
+            return track
+
+
+class FaceDetector:
+    def __init__(self, cascade, detect_width=320, full_every=10, roi_margin=0.25,
+                 motion_threshold=4.0, scale_factor=1.3, min_neighbors=5):
+        self.cascade = cascade  # callable returning a (thread-local) CascadeClassifier
+        self.detect_width = detect_width
+        self.full_every = full_every
+        self.roi_margin = roi_margin
+        self.motion_threshold = motion_threshold
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self._lock = threading.Lock()
+        self._stats = {'frames': 0, 'full': 0, 'roi': 0, 'unchanged': 0, 'total_ms': 0.0, 'last_ms': None}
+
+    def _scale(self, width):
+        return min(1.0, self.detect_width / width) if self.detect_width else 1.0
+
+    def _detect(self, gray, scale, offset=(0, 0), face_size=None):
+        """Run the cascade on ``gray`` shrunk by ``scale``; boxes in full-frame coordinates.
+
+        With ``face_size`` (a tracked face's width) only nearby window sizes
+        are searched, on a finer pyramid.
+        """
+        if scale < 1.0:
+            h, w = gray.shape
+            gray = cv2.resize(gray, (max(1, round(w * scale)), max(1, round(h * scale))),
+                              interpolation=cv2.INTER_AREA)
+        if face_size:
+            size = face_size * scale
+            faces = self.cascade().detectMultiScale(
+                gray, ROI_SCALE_FACTOR, self.min_neighbors,
+                minSize=(int(size * ROI_SIZE_RANGE[0]),) * 2, maxSize=(int(size * ROI_SIZE_RANGE[1]),) * 2)
+        else:
+            faces = self.cascade().detectMultiScale(gray, self.scale_factor, self.min_neighbors)
+        ox, oy = offset
+        return [(int(x / scale) + ox, int(y / scale) + oy, int(w / scale), int(h / scale))
+                for (x, y, w, h) in faces]
+
+    def _track(self, gray, boxes, scale):
+        # Re-find each tracked face inside its box grown by roi_margin;
+        # None if any of them is lost.
+        height, width = gray.shape
+        found = []
+        for (x, y, w, h) in boxes:
+            mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+            x0, y0 = max(0, x - mx), max(0, y - my)
+            x1, y1 = min(width, x + w + mx), min(height, y + h + my)
+            faces = self._detect(gray[y0:y1, x0:x1], scale, (x0, y0), w)
+            if not faces:
+                return None
+            found.append(max(faces, key=lambda f: f[2] * f[3]))
+        return found
+
+    def _signature(self, gray, boxes):
+        return np.stack([
+            cv2.resize(gray[y:y+h, x:x+w], SIGNATURE_SIZE, interpolation=cv2.INTER_AREA)
+            for (x, y, w, h) in boxes
+        ]).astype(np.float32)
+
+    def detect(self, frame, track=None):
+        """Return ``(boxes, changed)`` for a BGR frame.
+
+        ``changed`` is False when ``track`` already holds the same faces and
+        none of them moved more than ``motion_threshold`` (mean absolute
+        grey-level difference of a 16x16 thumbnail).
+        """
+        started = time.perf_counter()
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        scale = self._scale(gray.shape[1])
+
+        boxes = None
+        full = (track is None or not track.boxes or track.since_full is None
+                or track.since_full >= self.full_every)
+        if not full:
+            boxes = self._track(gray, track.boxes, scale)
+        if boxes is None:
+            full = True
+            boxes = self._detect(gray, scale)
+
+        changed = True
+        if track is not None:
+            signature = self._signature(gray, boxes) if boxes else None
+            if (signature is not None and track.signature is not None
+                    and signature.shape == track.signature.shape):
+                diff = np.abs(signature - track.signature).mean(axis=(1, 2)).max()
+                changed = diff > self.motion_threshold
+            if changed:
+                track.signature = signature
+                track.results = track.results_key = None
+            if full:
+                track.face_ids = track.assign_ids(boxes)
+            track.boxes = boxes
+            track.since_full = 0 if full else track.since_full + 1
+
+        elapsed = time.perf_counter() - started
+        metrics.observe('detect', elapsed)
+        elapsed_ms = elapsed * 1000
+        with self._lock:
+            s = self._stats
+            s['frames'] += 1
+            s['full' if full else 'roi'] += 1
+            s['unchanged'] += not changed
+            s['total_ms'] += elapsed_ms
+            s['last_ms'] = elapsed_ms
+        return boxes, changed
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        total_ms = s.pop('total_ms')
+        s['mean_ms'] = total_ms / s['frames'] if s['frames'] else None
+        return s
@@ -0,0 +1,100 @@
+import os
+import queue
+import threading
+from collections import Counter
+import cv2
+import numpy as np
+import face_ingest
+import features
+
+# --------------------------
+# Quality- and diversity-aware enrollment
+# --------------------------
+# Capture offers every single-face crop to an Enrollment. A crop is kept
+# only if it is sharp enough (variance of the Laplacian of the 50x50 sample),
+# the face is large enough in the frame, and it is not a near-duplicate
+# (cosine distance, as the matcher scores) of a sample already kept. Kept
+# samples are written by a background thread so the camera loop never waits
+# on disk. Capture stops once ``target`` diverse samples are kept.
+
+
+class ImageWriter:
+    """Writes ``(path, image)`` pairs on a background thread."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self.errors = []
+        self._thread = threading.Thread(target=self._run, name='enroll-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, path, image):
+        self._queue.put((path, image))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, image = item
+            if not cv2.imwrite(path, image):
+                self.errors.append(path)
+
+    def close(self):
+        """Block until every queued image is on disk."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+class Enrollment:
+    def __init__(self, folder, target=30, min_sharpness=100.0, min_face=80, duplicate_distance=0.005):
+        self.folder = folder
+        self.target = target
+        self.min_sharpness = min_sharpness
+        self.min_face = min_face
+        self.duplicate_distance = duplicate_distance
+        self.count = 0
+        self.rejected = Counter()
+        self._kept = np.empty((target, face_ingest.FEATURE_DIM), dtype=np.float32)  # L2-normalised
+        self._writer = ImageWriter()
+        os.makedirs(folder, exist_ok=True)
+
+    @property
+    def done(self):
+        return self.count >= self.target
+
+    def offer(self, frame, faces):
+        """Consider the faces detected in one frame.
+
+        Returns None if a sample was kept, else the rejection reason.
+        Frames with more than one face are skipped: the crop could be anyone.
+        """
+        if self.done:
+            return 'done'
+        if len(faces) != 1:
+            return self._reject('no_face' if not len(faces) else 'multiple_faces')
+        x, y, w, h = faces[0]
+        if min(w, h) < self.min_face:
+            return self._reject('too_small')
+
+        sample = features.face_sample(frame, faces[0])
+        gray = cv2.cvtColor(sample, cv2.COLOR_BGR2GRAY)
+        if cv2.Laplacian(gray, cv2.CV_64F).var() < self.min_sharpness:
+            return self._reject('blurry')
+
+        vector = sample.reshape(-1).astype(np.float32)
+        vector /= max(np.linalg.norm(vector), 1e-12)
+        if self.count and (1 - self._kept[:self.count] @ vector).min() < self.duplicate_distance:
+            return self._reject('duplicate')
+
+        self._kept[self.count] = vector
+        self._writer.write(os.path.join(self.folder, f"{self.count}.jpg"), sample)
+        self.count += 1
+        return None
+
+    def _reject(self, reason):
+        self.rejected[reason] += 1
+        return reason
+
+    def close(self):
+        self._writer.close()
+        return self.count
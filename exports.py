@@ -0,0 +1,124 @@
+import hashlib
+import os
+import tempfile
+from sqlalchemy import func
+import metrics
+from models import db, AttendanceRecord
+
+# --------------------------
+# Cached, streaming attendance exports
+# --------------------------
+# Rows are streamed from the attendance table straight into a write-only
+# workbook / incrementally drawn PDF, so memory stays flat however long the
+# range is. Finished files land in a content-addressed cache keyed by
+# (format, date range, data version): repeat downloads of unchanged days are
+# served from disk, and concurrent admins never overwrite each other's file.
+
+EXPORT_DIR = 'Attendance/exports'
+MAX_CACHED_EXPORTS = 100
+HEADERS = ['Date', 'Name', 'Roll', 'Time']
+
+
+def iter_rows(start, end, chunk_size=1000):
+    query = (AttendanceRecord.query
+             .filter(AttendanceRecord.date >= start, AttendanceRecord.date <= end)
+             .order_by(AttendanceRecord.date, AttendanceRecord.time)
+             .yield_per(chunk_size))
+    for r in query:
+        yield [r.date.strftime("%Y-%m-%d"), r.name, r.roll, r.time.strftime("%H:%M:%S")]
+
+
+def data_version(start, end):
+    # Marks are append-only, so (row count, highest id) in the range changes
+    # whenever the range's data does.
+    count, max_id = (db.session.query(func.count(AttendanceRecord.id), func.max(AttendanceRecord.id))
+                     .filter(AttendanceRecord.date >= start, AttendanceRecord.date <= end).one())
+    return count, max_id
+
+
+def write_xlsx(path, rows):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('Attendance')
+    ws.append(HEADERS)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def write_pdf(path, title, rows):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    c = canvas.Canvas(path, pagesize=A4)
+    width, height = A4
+    columns = [50, 140, 330, 460]
+
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(150, height - 50, title)
+    c.setFont("Helvetica", 12)
+    c.drawString(50, height - 80, "Generated by Smart Attendance System")
+
+    def header(y):
+        c.setFont("Helvetica-Bold", 12)
+        for x, text in zip(columns, HEADERS):
+            c.drawString(x, y, text)
+        c.setFont("Helvetica", 11)
+        return y - 20
+
+    y = header(height - 120)
+    for row in rows:
+        if y < 50:  # page break
+            c.showPage()
+            y = header(height - 50)
+        for x, value in zip(columns, row):
+            c.drawString(x, y, str(value))
+        y -= 20
+    c.save()
+
+
+def _prune(export_dir):
+    files = sorted((os.path.join(export_dir, f) for f in os.listdir(export_dir) if not f.endswith('.tmp')),
+                   key=os.path.getmtime)
+    for path in files[:-MAX_CACHED_EXPORTS]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def export_file(kind, start, end, export_dir=EXPORT_DIR):
+    """Path of the cached ``kind`` ('xlsx' or 'pdf') export, building it on a miss.
+
+    Returns None when the range has no attendance.
+    """
+    count, max_id = data_version(start, end)
+    if not count:
+        return None
+
+    key = hashlib.sha256(f"{kind}|{start}|{end}|{count}|{max_id}".encode()).hexdigest()[:32]
+    path = os.path.join(export_dir, f"{key}.{kind}")
+    hit = os.path.exists(path)
+    metrics.cache('export', hit)
+    if hit:
+        os.utime(path)  # keep recently used exports out of the prune
+        return path
+
+    os.makedirs(export_dir, exist_ok=True)
+    # A private temp file per build: threads of one worker share a pid
+    fd, tmp_path = tempfile.mkstemp(dir=export_dir, prefix=f"{key}.", suffix='.tmp')
+    os.close(fd)
+    try:
+        rows = iter_rows(start, end)
+        if kind == 'xlsx':
+            write_xlsx(tmp_path, rows)
+        else:
+            title = f"Attendance Report - {start}" if start == end else f"Attendance Report - {start} to {end}"
+            write_pdf(tmp_path, title, rows)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    _prune(export_dir)
+    return path
@@ -0,0 +1,54 @@
+import os
+import zipfile
+import face_ingest
+import face_store
+
+# --------------------------
+# Streaming ZIP export of face images
+# --------------------------
+# Archives are written into an in-memory sink and handed to the response a
+# chunk at a time, so nothing touches disk and memory stays at about one
+# chunk however many identities are exported. The images are already JPEGs,
+# so they are stored rather than deflated again.
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _Sink:
+    """Write-only, unseekable file object; zipfile falls back to data descriptors."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def iter_zip(names, faces_dir=face_store.FACES_DIR, prefix_names=True):
+    """Yield a ZIP archive of the images of ``names``, one chunk at a time.
+
+    With ``prefix_names`` each person's images sit in a ``<name>/`` folder;
+    otherwise (single-person downloads) they are at the archive root.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_STORED) as zf:
+        for name in names:
+            folder = os.path.join(faces_dir, name)
+            for filename, _, _ in face_ingest.scan_images(folder):
+                arcname = f"{name}/{filename}" if prefix_names else filename
+                zf.write(os.path.join(folder, filename), arcname)
+                if sink.size >= CHUNK_SIZE:
+                    yield sink.drain()
+    yield sink.drain()  # central directory
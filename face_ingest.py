@@ -0,0 +1,74 @@
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import numpy as np
+import features
+
+# --------------------------
+# Face image ingestion
+# --------------------------
+# Shared by app.py and train_from_webcam.py (through face_store): walks
+# static/faces with os.scandir, and decodes + resizes images into a
+# preallocated uint8 matrix, fanning out over a process pool for large
+# batches. Each file is identified by (name, mtime, size) so callers can skip
+# images that have not changed since the last run.
+
+IMAGE_SIZE = features.SAMPLE_SIZE
+FEATURE_DIM = features.SAMPLE_DIM
+PARALLEL_MIN = 256  # below this, process start-up costs more than it saves
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def scan_identities(faces_dir):
+    """Return the sorted identity folder names under ``faces_dir``."""
+    if not os.path.isdir(faces_dir):
+        return []
+    with os.scandir(faces_dir) as entries:
+        return sorted(e.name for e in entries if e.is_dir())
+
+
+def scan_images(folder):
+    """Return ``[(name, mtime_ns, size), ...]`` for the images in one folder, sorted by name."""
+    if not os.path.isdir(folder):
+        return []
+    with os.scandir(folder) as entries:
+        files = [
+            (e.name, e.stat().st_mtime_ns, e.stat().st_size)
+            for e in entries
+            if e.is_file() and e.name.lower().endswith(IMAGE_EXTENSIONS)
+        ]
+    return sorted(files)
+
+
+def decode_image(path):
+    image = cv2.imread(path)
+    if image is None:
+        return None
+    return features.face_sample(image).reshape(-1)
+
+
+def decode_images(paths, workers=None):
+    """Decode ``paths`` into a preallocated ``(len(paths), FEATURE_DIM)`` uint8 matrix.
+
+    Returns ``(matrix, ok)`` where ``ok`` flags the rows that decoded.
+    """
+    matrix = np.zeros((len(paths), FEATURE_DIM), dtype=np.uint8)
+    ok = np.zeros(len(paths), dtype=bool)
+    workers = workers or os.cpu_count() or 1
+
+    # Never fan out from a pool child (e.g. one re-importing the main module)
+    if len(paths) < PARALLEL_MIN or workers == 1 or mp.parent_process() is not None:
+        results = map(decode_image, paths)
+        for i, vector in enumerate(results):
+            if vector is not None:
+                matrix[i], ok[i] = vector, True
+        return matrix, ok
+
+    # spawn, not fork: the web process is multi-threaded
+    chunksize = max(1, len(paths) // (workers * 8))
+    with ProcessPoolExecutor(workers, mp_context=mp.get_context('spawn')) as pool:
+        for i, vector in enumerate(pool.map(decode_image, paths, chunksize=chunksize)):
+            if vector is not None:
+                matrix[i], ok[i] = vector, True
+    return matrix, ok
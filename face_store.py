@@ -0,0 +1,151 @@
+import json
+import os
+import numpy as np
+import face_ingest
+
+# --------------------------
+# Persistent per-identity feature store
+# --------------------------
+# Each registered face folder gets one ``<identity>.npy`` file holding its
+# flattened 50x50 BGR vectors (uint8, one row per image), plus a
+# ``<identity>.json`` sidecar listing the (name, mtime, size) of the image
+# behind every row. Enrolling or deleting a person only rewrites that
+# person's files; training reads the arrays back without touching any JPEG,
+# and a refresh only decodes images whose (name, mtime, size) changed.
+
+FACES_DIR = 'static/faces'
+FEATURES_DIR = 'static/features'
+IMAGE_SIZE = face_ingest.IMAGE_SIZE
+FEATURE_DIM = face_ingest.FEATURE_DIM
+
+
+def feature_path(identity, features_dir=FEATURES_DIR):
+    return os.path.join(features_dir, f"{identity}.npy")
+
+
+def manifest_path(identity, features_dir=FEATURES_DIR):
+    return os.path.join(features_dir, f"{identity}.json")
+
+
+def load_manifest(identity, features_dir=FEATURES_DIR):
+    try:
+        with open(manifest_path(identity, features_dir)) as f:
+            return [tuple(entry) for entry in json.load(f)]
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_vectors(identity, vectors, files, features_dir=FEATURES_DIR):
+    os.makedirs(features_dir, exist_ok=True)
+    path = feature_path(identity, features_dir)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, vectors)
+    os.replace(tmp_path, path)  # readers never see a half-written array
+
+    tmp_path = manifest_path(identity, features_dir) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(files, f)
+    os.replace(tmp_path, manifest_path(identity, features_dir))
+
+
+def refresh(identities, faces_dir=FACES_DIR, features_dir=FEATURES_DIR, workers=None):
+    """Bring the stored vectors of ``identities`` up to date with their folders.
+
+    Unchanged images reuse their stored rows; everything else is decoded in
+    one batch (in parallel when large). Returns the number of images decoded.
+    """
+    plans, to_decode = [], []
+    for identity in identities:
+        folder = os.path.join(faces_dir, identity)
+        files = face_ingest.scan_images(folder)
+        previous = load_manifest(identity, features_dir)
+        stored_rows = {}
+        if previous and os.path.exists(feature_path(identity, features_dir)):
+            vectors = np.load(feature_path(identity, features_dir))
+            if len(vectors) == len(previous):
+                stored_rows = {entry: vectors[i] for i, entry in enumerate(previous)}
+
+        sources = []
+        for entry in files:
+            if entry in stored_rows:
+                sources.append(stored_rows[entry])
+            else:
+                sources.append(len(to_decode))
+                to_decode.append(os.path.join(folder, entry[0]))
+        plans.append((identity, files, sources))
+
+    decoded, ok = face_ingest.decode_images(to_decode, workers)
+
+    for identity, files, sources in plans:
+        rows, kept = [], []
+        for entry, source in zip(files, sources):
+            if isinstance(source, int):
+                if not ok[source]:
+                    continue  # unreadable image
+                source = decoded[source]
+            rows.append(source)
+            kept.append(list(entry))
+        vectors = np.stack(rows).astype(np.uint8, copy=False) if rows else np.empty((0, FEATURE_DIM), dtype=np.uint8)
+        save_vectors(identity, vectors, kept, features_dir)
+    return len(to_decode)
+
+
+def add_identity(identity, faces_dir=FACES_DIR, features_dir=FEATURES_DIR):
+    refresh([identity], faces_dir, features_dir)
+    return len(load_manifest(identity, features_dir) or [])
+
+
+def remove_identity(identity, features_dir=FEATURES_DIR):
+    removed = False
+    for path in (feature_path(identity, features_dir), manifest_path(identity, features_dir)):
+        if os.path.exists(path):
+            os.remove(path)
+            removed = True
+    return removed
+
+
+def stored_identities(features_dir=FEATURES_DIR):
+    if not os.path.isdir(features_dir):
+        return []
+    return sorted(f[:-len('.npy')] for f in os.listdir(features_dir) if f.endswith('.npy'))
+
+
+def sync(faces_dir=FACES_DIR, features_dir=FEATURES_DIR):
+    """Backfill identities missing from the store and drop orphaned ones.
+
+    Only directory listings are compared; images are decoded just for
+    identities that have no stored vectors yet.
+    """
+    folders = set(face_ingest.scan_identities(faces_dir))
+    stored = set(stored_identities(features_dir))
+
+    refresh(sorted(folders - stored), faces_dir, features_dir)
+    for identity in stored - folders:
+        remove_identity(identity, features_dir)
+
+
+def rebuild(faces_dir=FACES_DIR, features_dir=FEATURES_DIR, workers=None):
+    """Re-check every identity's images, decoding only new or changed files."""
+    folders = face_ingest.scan_identities(faces_dir)
+    decoded = refresh(folders, faces_dir, features_dir, workers)
+    for identity in set(stored_identities(features_dir)) - set(folders):
+        remove_identity(identity, features_dir)
+    return decoded
+
+
+def load_features(features_dir=FEATURES_DIR):
+    """Return ``(data, labels)`` for every stored identity, ready to fit."""
+    identities = stored_identities(features_dir)
+    blocks = [np.load(feature_path(identity, features_dir), mmap_mode='r') for identity in identities]
+    total = sum(len(b) for b in blocks)
+
+    # Fill one preallocated matrix instead of concatenating copies
+    data = np.empty((total, FEATURE_DIM), dtype=np.uint8)
+    labels = np.empty(total, dtype=object)
+    offset = 0
+    for identity, vectors in zip(identities, blocks):
+        data[offset:offset + len(vectors)] = vectors
+        labels[offset:offset + len(vectors)] = identity
+        offset += len(vectors)
+    return data, labels.astype(str) if total else np.array([], dtype=str)
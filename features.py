@@ -0,0 +1,232 @@
+import os
+import cv2
+import numpy as np
+
+# --------------------------
+# Face feature extractors
+# --------------------------
+# Every face is first reduced to the same *sample*: the crop resized to 50x50
+# BGR and flattened (face_sample). The feature store keeps samples, and an
+# extractor turns a whole batch of them into feature vectors with NumPy
+# array operations. Training fits the extractor, stamps its versioned name
+# (and any fitted arrays) into the model, and the loaded model applies that
+# same extractor to live crops, so training and serving cannot drift apart.
+#
+#   raw-bgr-v1       the 7500 raw BGR pixels (what older models used)
+#   gray-eq-v1       grayscale + per-image histogram equalisation, 2500 dims
+#   lbp-v1           uniform LBP histograms on a 4x4 grid, 944 dims
+#   hog-v1           HOG, 9 orientations, 8x8 cells, 2x2 blocks, 900 dims
+#   pca-gray-eq-v1   gray-eq-v1 projected on its top principal components (64)
+# Changing what an extractor computes means registering a new name.
+
+SAMPLE_SIZE = (50, 50)
+SAMPLE_DIM = SAMPLE_SIZE[0] * SAMPLE_SIZE[1] * 3
+BATCH_ROWS = 4096  # bounds the float intermediates of a batch
+DEFAULT_EXTRACTOR = 'gray-eq-v1'  # keep Config.FEATURE_EXTRACTOR's default in step
+
+
+def face_sample(image, box=None):
+    """The 50x50 BGR sample of ``image`` (or of the ``(x, y, w, h)`` box in it)."""
+    if box is not None:
+        x, y, w, h = box
+        image = image[y:y+h, x:x+w]
+    return cv2.resize(image, SAMPLE_SIZE)
+
+
+def _gray(samples):
+    # (N, SAMPLE_DIM) BGR -> (N, 50, 50) uint8 luma, same weights as cv2
+    bgr = samples.reshape(len(samples), SAMPLE_SIZE[1], SAMPLE_SIZE[0], 3).astype(np.float32)
+    return np.rint(bgr @ np.array([0.114, 0.587, 0.299], dtype=np.float32)).astype(np.uint8)
+
+
+def _equalize(gray):
+    # Per-image histogram equalisation for the whole batch at once
+    n = len(gray)
+    flat = gray.reshape(n, -1)
+    hist = np.bincount((flat + np.arange(n)[:, None] * 256).ravel(), minlength=n * 256).reshape(n, 256)
+    cdf = hist.cumsum(axis=1)
+    cdf_min = cdf[np.arange(n), (hist > 0).argmax(axis=1)][:, None]
+    scale = 255 / np.maximum(flat.shape[1] - cdf_min, 1)
+    lut = np.clip(np.rint((cdf - cdf_min) * scale), 0, 255).astype(np.uint8)
+    return np.take_along_axis(lut, flat.astype(np.intp), axis=1).reshape(gray.shape)
+
+
+def _uniform_lbp_table():
+    # 58 uniform patterns (at most two 0/1 transitions) get their own bin,
+    # every other pattern shares bin 58
+    table = np.full(256, 58, dtype=np.intp)
+    uniform = [c for c in range(256) if bin(c ^ ((c << 1 | c >> 7) & 0xFF)).count('1') <= 2]
+    table[uniform] = np.arange(len(uniform))
+    return table
+
+
+def pca_components(A, n_components, rng, n_iter=4):
+    """Top principal axes of the centred rows of ``A``, as ``(n_components, dim)`` float32."""
+    # Randomised range finder (Halko et al.); far cheaper than a full SVD of
+    # a few thousand 7500-dim rows.
+    Q = A.T @ rng.standard_normal((A.shape[0], min(n_components + 10, A.shape[0]))).astype(np.float32)
+    for _ in range(n_iter):
+        Q, _ = np.linalg.qr(A.T @ (A @ Q))
+    _, _, vt = np.linalg.svd(A @ Q, full_matrices=False)
+    return (vt @ Q.T)[:n_components].astype(np.float32)
+
+
+class Extractor:
+    name = None
+    dim = None
+    dtype = np.float32
+    max_distance = 0.03  # default voting threshold in this feature space
+
+    def fit(self, samples):
+        return self
+
+    def transform(self, samples):
+        """Feature vectors for an ``(N, SAMPLE_DIM)`` batch, computed BATCH_ROWS at a time."""
+        samples = np.asarray(samples, dtype=np.uint8).reshape(-1, SAMPLE_DIM)
+        out = np.empty((len(samples), self.dim), dtype=self.dtype)
+        for start in range(0, len(samples), BATCH_ROWS):
+            out[start:start + BATCH_ROWS] = self._transform(samples[start:start + BATCH_ROWS])
+        return out
+
+    def _transform(self, samples):
+        raise NotImplementedError
+
+    def spec(self):
+        return {'name': self.name}
+
+    def save(self, model_dir):
+        pass
+
+    def load(self, model_dir):
+        return self
+
+
+class RawBGR(Extractor):
+    name = 'raw-bgr-v1'
+    dim = SAMPLE_DIM
+    dtype = np.uint8
+
+    def _transform(self, samples):
+        return samples
+
+
+class GrayEq(Extractor):
+    name = 'gray-eq-v1'
+    dim = SAMPLE_SIZE[0] * SAMPLE_SIZE[1]
+    dtype = np.uint8
+    max_distance = 0.05
+
+    def _transform(self, samples):
+        return _equalize(_gray(samples)).reshape(len(samples), -1)
+
+
+class LBP(Extractor):
+    name = 'lbp-v1'
+    grid = 4
+    dim = grid * grid * 59
+    max_distance = 0.16
+    _table = _uniform_lbp_table()
+
+    def _transform(self, samples):
+        gray = _gray(samples).astype(np.int16)
+        n, h, w = gray.shape
+        center = gray[:, 1:-1, 1:-1]
+        codes = np.zeros(center.shape, dtype=np.intp)
+        neighbours = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+        for bit, (dy, dx) in enumerate(neighbours):
+            codes |= (gray[:, 1 + dy:h - 1 + dy, 1 + dx:w - 1 + dx] >= center).astype(np.intp) << bit
+        codes = self._table[codes]
+
+        # Histogram per grid cell: one bincount over (image, cell, pattern)
+        ch, cw = codes.shape[1] // self.grid, codes.shape[2] // self.grid
+        codes = codes[:, :ch * self.grid, :cw * self.grid]
+        cell = (np.arange(ch * self.grid) // ch)[:, None] * self.grid + np.arange(cw * self.grid) // cw
+        index = (np.arange(n)[:, None, None] * self.grid ** 2 + cell) * 59 + codes
+        hist = np.bincount(index.ravel(), minlength=n * self.dim).reshape(n, self.grid ** 2, 59)
+        hist = hist / (ch * cw)
+        return np.sqrt(hist).reshape(n, -1)  # Hellinger: cosine on sqrt-histograms
+
+
+class HOG(Extractor):
+    name = 'hog-v1'
+    cell = 8
+    bins = 9
+    dim = 5 * 5 * 4 * bins  # 48x48 gradient field -> 6x6 cells -> 5x5 blocks of 2x2
+    max_distance = 0.12
+
+    def _transform(self, samples):
+        gray = _gray(samples).astype(np.float32)
+        n = len(gray)
+        gx = gray[:, 1:-1, 2:] - gray[:, 1:-1, :-2]
+        gy = gray[:, 2:, 1:-1] - gray[:, :-2, 1:-1]
+        magnitude = np.hypot(gx, gy)
+        orientation = (np.arctan2(gy, gx) % np.pi) * (self.bins / np.pi)
+        bins = np.minimum(orientation.astype(np.intp), self.bins - 1)
+
+        cells = gx.shape[1] // self.cell
+        cell = (np.arange(gx.shape[1]) // self.cell)[:, None] * cells + np.arange(gx.shape[2]) // self.cell
+        index = (np.arange(n)[:, None, None] * cells ** 2 + cell) * self.bins + bins
+        hist = np.bincount(index.ravel(), weights=magnitude.ravel(),
+                           minlength=n * cells ** 2 * self.bins).reshape(n, cells, cells, self.bins)
+
+        # 2x2-cell blocks with L2-Hys normalisation
+        blocks = np.concatenate([hist[:, :-1, :-1], hist[:, :-1, 1:], hist[:, 1:, :-1], hist[:, 1:, 1:]], axis=3)
+        blocks /= np.sqrt((blocks ** 2).sum(axis=3, keepdims=True) + 1e-6)
+        np.minimum(blocks, 0.2, out=blocks)
+        blocks /= np.sqrt((blocks ** 2).sum(axis=3, keepdims=True) + 1e-6)
+        return blocks.reshape(n, -1)
+
+
+class PCAGrayEq(Extractor):
+    name = 'pca-gray-eq-v1'
+    fit_rows = 5000
+    # Held-out people start at ~0.145; ~92% of genuine matches fall within
+    max_distance = 0.12
+
+    def __init__(self, components=64):
+        self.components = components
+        self.dim = components
+        self.base = GrayEq()
+        self.mean = None
+        self.basis = None
+
+    def fit(self, samples):
+        rng = np.random.default_rng(0)
+        rows = np.sort(rng.choice(len(samples), min(self.fit_rows, len(samples)), replace=False))
+        base = self.base.transform(np.asarray(samples)[rows]).astype(np.float32)
+        self.mean = base.mean(axis=0)
+        basis = pca_components(base - self.mean, min(self.components, len(base)), rng)
+        self.basis = np.zeros((self.components, base.shape[1]), dtype=np.float32)
+        self.basis[:len(basis)] = basis  # tiny training sets: pad with zero components
+        return self
+
+    def _transform(self, samples):
+        base = self.base._transform(samples).astype(np.float32)
+        return (base - self.mean) @ self.basis.T
+
+    def spec(self):
+        return {'name': self.name, 'params': {'components': self.components}}
+
+    def save(self, model_dir):
+        np.save(os.path.join(model_dir, 'extractor_mean.npy'), self.mean)
+        np.save(os.path.join(model_dir, 'extractor_basis.npy'), self.basis)
+
+    def load(self, model_dir):
+        self.mean = np.load(os.path.join(model_dir, 'extractor_mean.npy'))
+        self.basis = np.load(os.path.join(model_dir, 'extractor_basis.npy'))
+        return self
+
+
+EXTRACTORS = {cls.name: cls for cls in (RawBGR, GrayEq, LBP, HOG, PCAGrayEq)}
+
+
+def make_extractor(name=DEFAULT_EXTRACTOR, **params):
+    if name not in EXTRACTORS:
+        raise ValueError(f"Unknown feature extractor {name!r}; choose from {', '.join(EXTRACTORS)}")
+    return EXTRACTORS[name](**params)
+
+
+def load_extractor(spec, model_dir):
+    """The fitted extractor a model was trained with; models without one used raw pixels."""
+    spec = spec or {'name': RawBGR.name}
+    return make_extractor(spec['name'], **spec.get('params', {})).load(model_dir)
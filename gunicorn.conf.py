@@ -0,0 +1,20 @@
+# gunicorn.conf.py
+# Picked up automatically by `gunicorn app:app`. Gives every worker a shared
+# directory for Prometheus samples so /metrics reports all workers together.
+import os
+import shutil
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'metrics'))
+
+
+def on_starting(server):
+    # Samples from a previous run would be summed into this one
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,89 @@
+import os
+from sqlalchemy.exc import IntegrityError
+import face_ingest
+import face_store
+import sprites
+from attendance import split_identity
+from models import db, Identity
+
+# --------------------------
+# Registry of enrolled identities
+# --------------------------
+# Mirrors static/faces in the ``identity`` table: roll collisions, head
+# counts and the registered-faces page are answered from the database.
+# Rows are created when enrollment is queued and refreshed from the folder
+# only after that person's images change (capture finished, deletion).
+
+THUMBNAILS = 5
+
+
+def reserve(name):
+    """Create the row for a new enrollment; None if the roll is already taken."""
+    username, roll = split_identity(name)
+    db.session.add(Identity(name=name, username=username, roll=roll))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return Identity.query.filter_by(name=name).one()
+
+
+def refresh(name, faces_dir=face_store.FACES_DIR):
+    """Re-read one identity's folder (image count and thumbnails)."""
+    files = face_ingest.scan_images(f"{faces_dir}/{name}")
+    identity = Identity.query.filter_by(name=name).first()
+    if identity is None:
+        username, roll = split_identity(name)
+        identity = Identity(name=name, username=username, roll=roll)
+        db.session.add(identity)
+    identity.image_count = len(files)
+    identity.thumbnails = [f for f, _, _ in files[:THUMBNAILS]]
+    sprites.build(name, [f"{faces_dir}/{name}/{f}" for f in identity.thumbnails])
+    db.session.commit()
+    return identity
+
+
+def remove(name):
+    Identity.query.filter_by(name=name).delete()
+    db.session.commit()
+    sprites.remove(name)
+
+
+def roll_taken(roll):
+    return db.session.query(Identity.id).filter_by(roll=roll).first() is not None
+
+
+def count():
+    return Identity.query.count()
+
+
+def page(number, per_page=24):
+    return db.paginate(Identity.query.order_by(Identity.name), page=number, per_page=per_page,
+                       error_out=False)
+
+
+def mark_trained(version, names):
+    Identity.query.filter(Identity.name.in_(list(names))).update(
+        {'trained_version': version}, synchronize_session=False)
+    db.session.commit()
+
+
+def reconcile(faces_dir=face_store.FACES_DIR):
+    """Register face folders missing from the table and drop rows whose folder is gone.
+
+    Run at start-up; only the top-level directory listing is read, plus the
+    folders of identities that are new to the table or lack a sprite.
+    """
+    known = {name for (name,) in db.session.query(Identity.name)}
+    folders = set(face_ingest.scan_identities(faces_dir))
+    missing_sprites = {name for (name,) in db.session.query(Identity.name).filter(Identity.image_count > 0)
+                       if not os.path.exists(sprites.sprite_path(name))}
+    for name in sorted((folders - known) | (missing_sprites & folders)):
+        try:
+            refresh(name, faces_dir)
+        except IntegrityError:
+            db.session.rollback()  # two folders with one roll: keep the first
+    if known - folders:
+        Identity.query.filter(Identity.name.in_(list(known - folders))).delete(synchronize_session=False)
+        db.session.commit()
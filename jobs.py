@@ -0,0 +1,82 @@
+from datetime import datetime
+from sqlalchemy import inspect, text, update
+from sqlalchemy.exc import OperationalError
+from models import db, TrainingJob
+
+# --------------------------
+# Persistent job queue for enrollment, retraining and bulk user imports
+# --------------------------
+# Jobs live in the training_job table so their state survives restarts and is
+# visible to every web worker; worker.py claims and runs them one at a time.
+# Retrain requests that pile up while one is queued are merged into it.
+
+TRAINING_KINDS = ('enroll', 'retrain')
+
+
+def ensure_columns():
+    # create_all() leaves existing tables alone; add columns newer than them
+    if 'source' not in {c['name'] for c in inspect(db.engine).get_columns('training_job')}:
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(text("ALTER TABLE training_job ADD COLUMN source VARCHAR(255)"))
+        except OperationalError:
+            pass  # another worker added it first
+
+
+def enqueue(kind, identity=None, source=None):
+    if kind == 'retrain':
+        pending = TrainingJob.query.filter_by(kind='retrain', status='queued').first()
+        if pending:
+            return pending
+    job = TrainingJob(kind=kind, identity=identity, source=source, message='Queued')
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def claim_next():
+    """Atomically move the oldest queued job to 'running' and return it."""
+    while True:
+        job = TrainingJob.query.filter_by(status='queued').order_by(TrainingJob.id).first()
+        if job is None:
+            return None
+        claimed = db.session.execute(
+            update(TrainingJob)
+            .where(TrainingJob.id == job.id, TrainingJob.status == 'queued')
+            .values(status='running', message='Started', updated_at=datetime.now())
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            db.session.refresh(job)
+            return job  # otherwise another worker got it first; try the next
+
+
+def report(job, progress=None, message=None, status=None):
+    if progress is not None:
+        job.progress = int(progress)
+    if message is not None:
+        job.message = message
+    if status is not None:
+        job.status = status
+    db.session.commit()
+
+
+def merge_pending_retrains(job):
+    """Fold queued retrains into ``job``: the model it publishes covers them too."""
+    merged = (TrainingJob.query
+              .filter(TrainingJob.kind == 'retrain', TrainingJob.status == 'queued', TrainingJob.id != job.id)
+              .update({'status': 'done', 'progress': 100, 'message': f'Merged into job #{job.id}'}))
+    db.session.commit()
+    return merged
+
+
+def requeue_interrupted():
+    # Jobs left 'running' by a worker that died are picked up again
+    count = TrainingJob.query.filter_by(status='running').update({'status': 'queued', 'message': 'Requeued after restart'})
+    db.session.commit()
+    return count
+
+
+def recent(limit=20, kinds=TRAINING_KINDS):
+    query = TrainingJob.query.filter(TrainingJob.kind.in_(kinds))
+    return query.order_by(TrainingJob.id.desc()).limit(limit).all()
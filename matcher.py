@@ -0,0 +1,235 @@
+import os
+from collections import namedtuple
+import numpy as np
+from features import pca_components
+
+# --------------------------
+# Nearest-neighbour matchers
+# --------------------------
+# All backends score by cosine distance (1 - cos) between L2-normalised
+# vectors and vote over the k nearest rows, so scores are comparable whichever
+# backend is configured:
+#   exact     batched matrix-multiply top-k over the whole (memory-mapped) matrix
+#   centroid  per-identity centroids shortlist a few identities, exact search
+#             over just their rows
+#   ivf       PCA-reduced vectors in an inverted-file index; probe the nearest
+#             lists, then re-rank the shortlist exactly
+# The centroid and IVF indexes are built at training time by build_indexes()
+# and saved next to the embeddings.
+
+Match = namedtuple('Match', ['label', 'distance', 'confidence'])
+
+CHUNK_ROWS = 1024
+PCA_DIM = 64
+PCA_SAMPLE = 5000
+KMEANS_SAMPLE = 20000
+KMEANS_ITERS = 10
+
+
+def normalize(X):
+    X = np.asarray(X, dtype=np.float32).reshape(len(X), -1)
+    return X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+
+
+def _merge_top(best_s, best_i, sims, ids, k):
+    cand_s = np.concatenate([best_s, sims], axis=1)
+    cand_i = np.concatenate([best_i, ids], axis=1)
+    top = np.argpartition(-cand_s, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(cand_s, top, axis=1), np.take_along_axis(cand_i, top, axis=1)
+
+
+def _finish(best_s, best_i):
+    order = np.argsort(-best_s, axis=1)
+    dist = 1 - np.take_along_axis(best_s, order, axis=1)
+    return np.clip(dist, 0, 2), np.take_along_axis(best_i, order, axis=1)
+
+
+class Matcher:
+    name = None
+
+    def __init__(self, model, n_neighbors=5):
+        self.model = model
+        self.n_neighbors = n_neighbors
+        self.norms = np.sqrt(np.maximum(model.sq_norms, 1e-12))
+
+    def search(self, X, k):
+        """Return ``(distances, rows)`` of the k nearest rows, nearest first.
+
+        Missing neighbours (fewer than k candidates) have row index -1.
+        """
+        raise NotImplementedError
+
+    def _score_rows(self, Xn, rows, k):
+        # Exact cosine against an arbitrary subset of rows (gathered from the memmap)
+        best_s = np.full((len(Xn), k), -np.inf, dtype=np.float32)
+        best_i = np.full((len(Xn), k), -1, dtype=np.int64)
+        for start in range(0, len(rows), CHUNK_ROWS):
+            ids = rows[start:start + CHUNK_ROWS]
+            chunk = np.asarray(self.model.embeddings[ids], dtype=np.float32)
+            sims = (Xn @ chunk.T) / self.norms[ids]
+            best_s, best_i = _merge_top(best_s, best_i, sims, np.broadcast_to(ids, sims.shape), k)
+        return best_s, best_i
+
+    def match(self, X):
+        k = min(self.n_neighbors, len(self.model))
+        dist, rows = self.search(X, k)
+        results = []
+        for d_row, i_row in zip(dist, rows):
+            valid = i_row >= 0
+            if not valid.any():
+                results.append(Match(None, 2.0, 0.0))
+                continue
+            d_row, i_row = d_row[valid], i_row[valid]
+            label_ids = self.model.label_ids[i_row]
+            votes = np.bincount(label_ids)
+            # Majority vote; ties go to the label of the nearest neighbour
+            tied = np.flatnonzero(votes == votes.max())
+            winner = next(label for label in label_ids if label in tied)
+            results.append(Match(
+                self.model.labels[winner],
+                float(d_row[label_ids == winner].min()),
+                float(votes[winner] / len(label_ids)),
+            ))
+        return results
+
+
+class ExactMatcher(Matcher):
+    name = 'exact'
+
+    def search(self, X, k):
+        Xn = normalize(X)
+        best_s = np.full((len(Xn), k), -np.inf, dtype=np.float32)
+        best_i = np.full((len(Xn), k), -1, dtype=np.int64)
+        for start in range(0, len(self.model), CHUNK_ROWS):
+            chunk = np.asarray(self.model.embeddings[start:start + CHUNK_ROWS], dtype=np.float32)
+            sims = (Xn @ chunk.T) / self.norms[start:start + len(chunk)]
+            ids = np.broadcast_to(np.arange(start, start + len(chunk)), sims.shape)
+            best_s, best_i = _merge_top(best_s, best_i, sims, ids, k)
+        return _finish(best_s, best_i)
+
+
+class CentroidMatcher(Matcher):
+    name = 'centroid'
+
+    def __init__(self, model, n_neighbors=5, shortlist=5):
+        super().__init__(model, n_neighbors)
+        self.shortlist = shortlist
+        self.centroids = np.load(os.path.join(model.model_dir, 'centroids.npy')).astype(np.float32)
+        self.label_ranges = np.load(os.path.join(model.model_dir, 'label_ranges.npy'))
+
+    def search(self, X, k):
+        Xn = normalize(X)
+        n_short = min(self.shortlist, len(self.centroids))
+        nearest = np.argpartition(-(Xn @ self.centroids.T), n_short - 1, axis=1)[:, :n_short]
+        dist = np.full((len(Xn), k), 2.0, dtype=np.float32)
+        rows = np.full((len(Xn), k), -1, dtype=np.int64)
+        for q, labels in enumerate(nearest):
+            cands = np.concatenate([np.arange(*self.label_ranges[label]) for label in labels])
+            s, i = self._score_rows(Xn[q:q + 1], cands, k)
+            d, i = _finish(s, i)
+            dist[q, :d.shape[1]], rows[q, :i.shape[1]] = d[0], i[0]
+        return dist, rows
+
+
+class IVFMatcher(Matcher):
+    name = 'ivf'
+
+    def __init__(self, model, n_neighbors=5, nprobe=8, rerank=10):
+        super().__init__(model, n_neighbors)
+        self.nprobe = nprobe
+        self.rerank = rerank
+        load = lambda name, **kw: np.load(os.path.join(model.model_dir, name), **kw)
+        self.pca_mean = load('pca_mean.npy')
+        self.pca_components = load('pca_components.npy')
+        self.list_centroids = load('ivf_centroids.npy')
+        self.list_ids = load('ivf_ids.npy', mmap_mode='r')
+        self.list_offsets = load('ivf_offsets.npy')
+        self.reduced = load('ivf_reduced.npy', mmap_mode='r')
+
+    def search(self, X, k):
+        Xn = normalize(X)
+        Q = normalize((Xn - self.pca_mean) @ self.pca_components.T)
+        n_probe = min(self.nprobe, len(self.list_centroids))
+        probes = np.argpartition(-(Q @ self.list_centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+
+        dist = np.full((len(Xn), k), 2.0, dtype=np.float32)
+        rows = np.full((len(Xn), k), -1, dtype=np.int64)
+        for q, lists in enumerate(probes):
+            cands = np.sort(np.concatenate([self.list_ids[self.list_offsets[l]:self.list_offsets[l + 1]] for l in lists]))
+            if not len(cands):
+                continue
+            # Shortlist in the reduced space, then re-rank on the full vectors
+            n_short = min(k * self.rerank, len(cands))
+            approx = np.asarray(self.reduced[cands], dtype=np.float32) @ Q[q]
+            short = cands[np.argpartition(-approx, n_short - 1)[:n_short]]
+            s, i = self._score_rows(Xn[q:q + 1], np.sort(short), k)
+            d, i = _finish(s, i)
+            dist[q, :d.shape[1]], rows[q, :i.shape[1]] = d[0], i[0]
+        return dist, rows
+
+
+MATCHERS = {m.name: m for m in (ExactMatcher, CentroidMatcher, IVFMatcher)}
+
+
+def make_matcher(model, backend='exact', **params):
+    if backend not in MATCHERS:
+        raise ValueError(f"Unknown matcher backend: {backend}")
+    return MATCHERS[backend](model, model.n_neighbors, **params)
+
+
+# --------------------------
+# Index building (run at training time)
+# --------------------------
+def _normalized_chunks(embeddings):
+    for start in range(0, len(embeddings), CHUNK_ROWS):
+        yield start, normalize(embeddings[start:start + CHUNK_ROWS])
+
+
+def _kmeans(X, n_clusters, rng):
+    centers = X[rng.choice(len(X), n_clusters, replace=False)]
+    for _ in range(KMEANS_ITERS):
+        assign = np.argmax(X @ centers.T, axis=1)
+        for c in range(n_clusters):
+            members = X[assign == c]
+            if len(members):
+                centers[c] = members.mean(axis=0)
+        centers = normalize(centers)
+    return centers
+
+
+def build_indexes(model_dir, embeddings, label_ids, n_labels):
+    """Write centroid and IVF index files for rows already sorted by label."""
+    save = lambda name, arr: np.save(os.path.join(model_dir, name), arr)
+    rng = np.random.default_rng(0)
+
+    # Per-identity centroids and the contiguous row range of each identity
+    bounds = np.searchsorted(label_ids, np.arange(n_labels + 1))
+    centroids = np.stack([normalize(embeddings[a:b]).mean(axis=0) for a, b in zip(bounds[:-1], bounds[1:])])
+    save('centroids.npy', normalize(centroids).astype(np.float16))
+    save('label_ranges.npy', np.stack([bounds[:-1], bounds[1:]], axis=1).astype(np.int64))
+
+    # PCA on a sample of normalised rows
+    sample_ids = np.sort(rng.choice(len(embeddings), min(PCA_SAMPLE, len(embeddings)), replace=False))
+    sample = normalize(embeddings[sample_ids])
+    mean = sample.mean(axis=0)
+    components = pca_components(sample - mean, min(PCA_DIM, len(sample)), rng)
+    save('pca_mean.npy', mean.astype(np.float32))
+    save('pca_components.npy', components)
+
+    reduced = np.empty((len(embeddings), len(components)), dtype=np.float16)
+    for start, chunk in _normalized_chunks(embeddings):
+        reduced[start:start + len(chunk)] = normalize((chunk - mean) @ components.T)
+    save('ivf_reduced.npy', reduced)
+
+    # Coarse quantizer: spherical k-means with ~sqrt(N) lists
+    n_lists = int(np.clip(np.sqrt(len(embeddings)), 1, 4096))
+    train = reduced[rng.choice(len(reduced), min(KMEANS_SAMPLE, len(reduced)), replace=False)].astype(np.float32)
+    centers = _kmeans(train, min(n_lists, len(train)), rng)
+    assign = np.concatenate([
+        np.argmax(reduced[s:s + CHUNK_ROWS].astype(np.float32) @ centers.T, axis=1)
+        for s in range(0, len(reduced), CHUNK_ROWS)
+    ])
+    save('ivf_centroids.npy', centers.astype(np.float32))
+    save('ivf_ids.npy', np.argsort(assign, kind='stable').astype(np.int64))
+    save('ivf_offsets.npy', np.searchsorted(np.sort(assign), np.arange(len(centers) + 1)).astype(np.int64))
+    return {'centroids': n_labels, 'pca_dim': len(components), 'ivf_lists': len(centers)}
@@ -0,0 +1,131 @@
+import os
+import time
+from contextlib import nullcontext
+from functools import wraps
+from flask import g, before_render_template, request, template_rendered
+from config import Config
+
+# --------------------------
+# Hot-path metrics (Prometheus)
+# --------------------------
+# Stage timers (``with timer('detect'):`` / ``@timed('mark')``) feed one
+# latency histogram labelled by stage; counters track scans, recognition
+# outcomes, marks and cache hit/miss. Under gunicorn every worker writes its
+# samples to PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py) and /metrics
+# sums them across workers. With METRICS_ENABLED off, timers are a shared
+# no-op context manager and decorators return the function unchanged.
+
+ENABLED = Config.METRICS_ENABLED
+BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+STAGE_SECONDS = SCANS = FACES = MARKS = CACHE = MODEL_VERSION = REQUEST_SECONDS = None
+if ENABLED:
+    from prometheus_client import Counter, Gauge, Histogram
+
+    STAGE_SECONDS = Histogram('attendance_stage_seconds', 'Time spent in each hot-path stage',
+                              ['stage'], buckets=BUCKETS)
+    REQUEST_SECONDS = Histogram('attendance_request_seconds', 'Request latency by endpoint',
+                                ['endpoint'], buckets=BUCKETS)
+    SCANS = Counter('attendance_scans', 'Frames received for recognition')
+    FACES = Counter('attendance_faces', 'Recognized faces by voting outcome (committed, unknown, pending)',
+                    ['outcome'])
+    MARKS = Counter('attendance_marks', 'Attendance mark attempts by result (marked, duplicate)', ['result'])
+    CACHE = Counter('attendance_cache', 'Cache lookups by cache and result (hit, miss)', ['cache', 'result'])
+    MODEL_VERSION = Gauge('attendance_model_version', 'Publish time (unix seconds) of the loaded face model',
+                          multiprocess_mode='max')
+
+
+class _Timer:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.labels(self.stage).observe(time.perf_counter() - self.started)
+
+
+_NULL = nullcontext()
+
+
+def timer(stage):
+    return _Timer(stage) if ENABLED else _NULL
+
+
+def timed(stage):
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Timer(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def observe(stage, seconds):
+    if ENABLED:
+        STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def inc(metric, *labels, amount=1):
+    if ENABLED:
+        (metric.labels(*labels) if labels else metric).inc(amount)
+
+
+def cache(name, hit):
+    if ENABLED:
+        CACHE.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def set_model_version(version):
+    # Versions are "v<publish time in ns>"
+    if ENABLED and version:
+        MODEL_VERSION.set(int(version.lstrip('v')) / 1e9)
+
+
+def init_app(app):
+    """Time every request by endpoint and every template render."""
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def _start_request():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _finish_request(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            REQUEST_SECONDS.labels(request.endpoint or 'unknown').observe(time.perf_counter() - started)
+        return response
+
+    def _start_render(sender, template, context, **extra):
+        g._metrics_render_started = time.perf_counter()
+
+    def _finish_render(sender, template, context, **extra):
+        started = g.pop('_metrics_render_started', None)
+        if started is not None:
+            STAGE_SECONDS.labels('render').observe(time.perf_counter() - started)
+
+    before_render_template.connect(_start_render, app, weak=False)
+    template_rendered.connect(_finish_render, app, weak=False)
+
+
+def render():
+    """``(body, content_type)`` of the Prometheus text exposition."""
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, generate_latest
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,106 @@
+import logging
+import os
+import threading
+import time
+import cv2
+import metrics
+import model_store
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+
+# --------------------------
+# Process-level model registry
+# --------------------------
+class ModelRegistry:
+    """Loads the face cascade and recognition model once per process.
+
+    Each ``model()`` call only stats the ``CURRENT`` pointer; when a retrain
+    publishes a new version the model is reloaded and swapped in atomically.
+    """
+
+    def __init__(self, model_dir=model_store.MODEL_DIR, cascade_path=CASCADE_PATH,
+                 backend='exact', matcher_params=None):
+        self.model_dir = model_dir
+        self.cascade_path = cascade_path
+        self.backend = backend
+        self.matcher_params = matcher_params or {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._model = None
+        self._pointer_mtime = None
+        self._stats = {
+            'version': None,
+            'backend': backend,
+            'loads': 0,
+            'last_load_seconds': None,
+            'last_swap_seconds': None,
+            'last_swap_at': None,
+        }
+
+    def cascade(self):
+        # CascadeClassifier is not safe to share between threads, so each
+        # thread lazily builds its own copy.
+        cascade = getattr(self._local, 'cascade', None)
+        if cascade is None:
+            cascade = self._local.cascade = cv2.CascadeClassifier(self.cascade_path)
+        return cascade
+
+    def model(self):
+        try:
+            mtime = os.stat(model_store.pointer_path(self.model_dir)).st_mtime_ns
+        except FileNotFoundError:
+            return self._model
+        if mtime != self._pointer_mtime:
+            self._reload(mtime)
+        return self._model
+
+    def _reload(self, mtime):
+        with self._lock:
+            if mtime == self._pointer_mtime:
+                return  # another thread already swapped it in
+            started = time.perf_counter()
+            version = model_store.current_version(self.model_dir)
+            if self._model is not None and version == self._model.version:
+                self._pointer_mtime = mtime
+                return
+
+            try:
+                model = model_store.load_model(self.model_dir, version, self.backend, **self.matcher_params)
+            except ValueError as e:
+                # A model from an older format: serve nothing until it is retrained
+                logger.warning("Cannot load face model %s: %s", version, e)
+                self._pointer_mtime = mtime
+                return
+            loaded = time.perf_counter()
+            self._model = model
+            self._pointer_mtime = mtime
+            metrics.observe('model_load', loaded - started)
+            metrics.set_model_version(version)
+
+            # Swap latency: from the retrain publishing the pointer to this
+            # process serving the new version.
+            swapped_at = time.time()
+            load_seconds = loaded - started
+            swap_seconds = max(swapped_at - mtime / 1e9, 0.0)
+            self._stats.update(
+                version=version,
+                loads=self._stats['loads'] + 1,
+                last_load_seconds=load_seconds,
+                last_swap_seconds=swap_seconds,
+                last_swap_at=swapped_at,
+            )
+            logger.info("Loaded face model %s in %.1f ms (%.1f ms after publish)",
+                        version, load_seconds * 1000, swap_seconds * 1000)
+
+    def stats(self):
+        return dict(self._stats)
+
+
+registry = ModelRegistry(
+    backend=Config.MATCHER_BACKEND,
+    matcher_params=Config.MATCHER_PARAMS.get(Config.MATCHER_BACKEND),
+)
@@ -0,0 +1,157 @@
+import json
+import os
+import shutil
+import time
+import numpy as np
+import features
+import matcher
+
+# --------------------------
+# Versioned, memory-mapped face model
+# --------------------------
+# Every training run writes a fresh ``MODEL_DIR/<version>/`` directory and then
+# atomically repoints ``MODEL_DIR/CURRENT`` at it, so a reader never sees a
+# half-written model. On-disk layout (format version 2) of a version directory:
+#   manifest.json   format version, dtype, dim, row count, k, feature extractor
+#   embeddings.npy  contiguous (rows, dim) uint8/float16 matrix
+#   sq_norms.npy    float32 squared L2 norm of every row
+#   label_ids.npy   int32 index into labels.json for every row
+#   labels.json     list of identity names
+#   centroids.npy, label_ranges.npy, pca_*.npy, ivf_*.npy
+#                   search indexes for the matcher backends (see matcher.py)
+#   extractor_*.npy fitted arrays of the feature extractor, if it has any
+# Embeddings are extractor features, not raw pixels: match() runs the model's
+# own extractor on incoming 50x50 samples (see features.py).
+# Rows are sorted by label so each identity occupies a contiguous range.
+# The matrix is opened with ``mmap_mode='r'`` so every worker shares the same
+# pages through the OS page cache instead of holding a private float64 copy.
+
+FORMAT_VERSION = 2  # 2: cosine scoring and matcher index files
+MODEL_DIR = 'static/model'
+POINTER_FILE = 'CURRENT'
+KEEP_VERSIONS = 3
+
+
+class FaceModel:
+    def __init__(self, model_dir, manifest, embeddings, sq_norms, label_ids, labels):
+        self.model_dir = model_dir
+        self.manifest = manifest
+        self.version = manifest['version']
+        self.embeddings = embeddings
+        self.sq_norms = sq_norms
+        self.label_ids = label_ids
+        self.labels = np.array(labels)
+        self.n_neighbors = manifest['n_neighbors']
+        self.extractor = features.load_extractor(manifest.get('extractor'), model_dir)
+        self.matcher = None
+
+    def __len__(self):
+        return len(self.label_ids)
+
+    def match(self, samples):
+        """Return a ``matcher.Match(label, distance, confidence)`` per 50x50 face sample."""
+        return self.matcher.match(self.extractor.transform(samples))
+
+    def predict(self, X):
+        return np.array([m.label for m in self.match(X)])
+
+
+def pointer_path(model_dir=MODEL_DIR):
+    return os.path.join(model_dir, POINTER_FILE)
+
+
+def current_version(model_dir=MODEL_DIR):
+    try:
+        with open(pointer_path(model_dir)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_model(samples, labels, model_dir=MODEL_DIR, n_neighbors=5, extractor=features.DEFAULT_EXTRACTOR):
+    """Fit ``extractor`` (a name or an Extractor) on the 50x50 samples and publish a new version."""
+    if isinstance(extractor, str):
+        extractor = features.make_extractor(extractor)
+    names, label_ids = np.unique(np.asarray(labels), return_inverse=True)
+    order = np.argsort(label_ids, kind='stable')
+    samples, label_ids = np.asarray(samples)[order], label_ids[order]
+    data = extractor.fit(samples).transform(samples)
+    dtype = np.uint8 if data.dtype == np.uint8 else np.float16
+    embeddings = np.ascontiguousarray(data, dtype=dtype)
+    sq_norms = np.einsum('ij,ij->i', embeddings.astype(np.float32), embeddings.astype(np.float32))
+
+    version = f"v{time.time_ns()}"
+    version_dir = os.path.join(model_dir, version)
+    os.makedirs(version_dir)
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'dtype': np.dtype(dtype).name,
+        'dim': int(embeddings.shape[1]),
+        'count': int(len(embeddings)),
+        'n_neighbors': int(n_neighbors),
+        'extractor': extractor.spec(),
+    }
+    extractor.save(version_dir)
+    np.save(os.path.join(version_dir, 'embeddings.npy'), embeddings)
+    np.save(os.path.join(version_dir, 'sq_norms.npy'), sq_norms.astype(np.float32))
+    np.save(os.path.join(version_dir, 'label_ids.npy'), label_ids.astype(np.int32))
+    with open(os.path.join(version_dir, 'labels.json'), 'w') as f:
+        json.dump(names.tolist(), f)
+    manifest['indexes'] = matcher.build_indexes(version_dir, embeddings, label_ids, len(names))
+    with open(os.path.join(version_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+
+    publish(version, model_dir)
+    return manifest
+
+
+def publish(version, model_dir=MODEL_DIR):
+    tmp_path = f"{pointer_path(model_dir)}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, pointer_path(model_dir))
+
+    # Keep a few old versions around for workers still mapping them
+    versions = sorted(d for d in os.listdir(model_dir) if d.startswith('v') and d != version)
+    for old in versions[:-(KEEP_VERSIONS - 1) or None]:
+        shutil.rmtree(os.path.join(model_dir, old), ignore_errors=True)
+
+
+def model_exists(model_dir=MODEL_DIR):
+    """True if a model in the current format is published; older ones must be retrained."""
+    version = current_version(model_dir)
+    if version is None:
+        return False
+    try:
+        with open(os.path.join(model_dir, version, 'manifest.json')) as f:
+            return json.load(f).get('format_version') == FORMAT_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+def load_model(model_dir=MODEL_DIR, version=None, backend='exact', **matcher_params):
+    version = version or current_version(model_dir)
+    if version is None:
+        raise FileNotFoundError(f"No published model in {model_dir}")
+    version_dir = os.path.join(model_dir, version)
+
+    with open(os.path.join(version_dir, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported model format: {manifest.get('format_version')}")
+
+    with open(os.path.join(version_dir, 'labels.json')) as f:
+        labels = json.load(f)
+    model = FaceModel(
+        version_dir,
+        manifest,
+        np.load(os.path.join(version_dir, 'embeddings.npy'), mmap_mode='r'),
+        np.load(os.path.join(version_dir, 'sq_norms.npy')),
+        np.load(os.path.join(version_dir, 'label_ids.npy')),
+        labels,
+    )
+    model.matcher = matcher.make_matcher(model, backend, **matcher_params)
+    return model
@@ -1,9 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime
+from datetime import datetime, date
+import sqlite3
 
 db = SQLAlchemy()
 
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run alongside the attendance writer; busy_timeout makes
+    # writers from other gunicorn workers wait for the lock instead of failing.
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(100), unique=True, nullable=False)
@@ -16,9 +30,85 @@ class User(db.Model):
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+
+# Admin directory (see users.py): role counts and case-insensitive prefix search
+db.Index('ix_user_role', User.role)
+db.Index('ix_user_username_lower', db.func.lower(User.username))
+
 class AttendanceRecord(db.Model):
+    # One row per person per day; the unique index doubles as the duplicate check
+    __table_args__ = (
+        db.UniqueConstraint('username', 'date', name='uq_attendance_username_date'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    username = db.Column(db.String(100), nullable=False)
+    username = db.Column(db.String(100), nullable=False, index=True)
     roll = db.Column(db.String(20), nullable=False)
-    date = db.Column(db.Date, default=datetime.utcnow)
-    time = db.Column(db.Time, default=datetime.utcnow().time)
+    date = db.Column(db.Date, nullable=False, index=True, default=date.today)
+    time = db.Column(db.Time, nullable=False, default=lambda: datetime.now().time())
+
+    @property
+    def name(self):
+        # Face identity label, as used for the folders under static/faces
+        return f"{self.username}_{self.roll}"
+
+# --------------------------
+# Attendance rollups (kept current by attendance.AttendanceWriter)
+# --------------------------
+class DailyRollup(db.Model):
+    date = db.Column(db.Date, primary_key=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    first_seen = db.Column(db.Time)
+    last_seen = db.Column(db.Time)
+
+class PersonMonthRollup(db.Model):
+    username = db.Column(db.String(100), primary_key=True)
+    month = db.Column(db.Date, primary_key=True, index=True)  # first day of the month
+    roll = db.Column(db.String(20), nullable=False)
+    present_days = db.Column(db.Integer, nullable=False, default=0)
+    first_seen = db.Column(db.Time)  # earliest arrival that month
+
+# --------------------------
+# Background training jobs (see jobs.py / worker.py)
+# --------------------------
+class TrainingJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)  # 'enroll', 'retrain' or 'import_users'
+    identity = db.Column(db.String(120))
+    source = db.Column(db.String(255))  # import_users: uploaded file name in users.IMPORTS_DIR
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'identity': self.identity,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'created_at': self.created_at.isoformat(timespec='seconds'),
+            'updated_at': self.updated_at.isoformat(timespec='seconds'),
+        }
+
+# --------------------------
+# Enrolled identities (see identities.py)
+# --------------------------
+class Identity(db.Model):
+    # One row per static/faces/<username>_<roll> folder, so pages never walk
+    # the filesystem; the unique roll index doubles as the collision check
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), unique=True, nullable=False)  # folder name
+    username = db.Column(db.String(100), nullable=False, index=True)
+    roll = db.Column(db.String(20), unique=True, nullable=False)
+    image_count = db.Column(db.Integer, nullable=False, default=0)
+    thumbnails = db.Column(db.JSON, nullable=False, default=list)  # up to THUMBNAILS image names
+    trained_version = db.Column(db.String(40))  # latest model that includes these images
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, onupdate=datetime.now)
+
+    @property
+    def sprite_version(self):
+        return int(self.updated_at.timestamp())
@@ -0,0 +1,13 @@
+# rebuild_rollups.py
+# Recomputes the analytics rollups from scratch, after first backfilling any
+# legacy Attendance/Attendance-MM_DD_YY.csv files into the attendance table.
+# Safe to re-run: marks already in the table are skipped.
+from app import app
+from attendance import import_csv_files
+import rollups
+
+with app.app_context():
+    imported, skipped = import_csv_files('Attendance')
+    print(f"Backfilled {imported} attendance rows from Attendance/ ({skipped} already present).")
+    days, person_months = rollups.rebuild()
+    print(f"Rebuilt rollups: {days} days, {person_months} person-months.")
@@ -0,0 +1,165 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import cv2
+import numpy as np
+import metrics
+from config import Config
+from detection import FaceDetector, TrackStore
+from features import face_sample
+from model_registry import registry
+from voting import VoteSession, single_frame
+
+# --------------------------
+# Frame recognition for remote kiosks
+# --------------------------
+# Kiosks POST JPEG frames; detection and matching run on a bounded thread pool
+# (OpenCV and NumPy release the GIL) so one server handles many kiosks at once.
+# When every worker slot and queue slot is taken, submit() raises PoolBusy
+# instead of letting requests pile up. Crops are matched through the shared
+# MicroBatcher so concurrent frames share one batched predict. Kiosks that
+# send an id get a detection Track and their frames are recognized in order:
+# faces are followed between frames and a frame whose faces have not moved
+# reuses the previous recognition result once they are all decided.
+# A tracked face's identity is only committed once several frames agree (see
+# voting.py); each result's ``identity`` is that decision, ``label`` the
+# single-frame match. Reused results never count as votes.
+
+detector = FaceDetector(
+    registry.cascade,
+    detect_width=Config.DETECT_WIDTH,
+    full_every=Config.DETECT_FULL_EVERY,
+    roi_margin=Config.DETECT_ROI_MARGIN,
+    motion_threshold=Config.DETECT_MOTION_THRESHOLD,
+)
+tracks = TrackStore()
+
+
+class PoolBusy(Exception):
+    pass
+
+
+class RecognitionPool:
+    def __init__(self, batcher, workers=4, queue_size=32):
+        self.batcher = batcher
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='recognize')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def submit(self, frames, track=None):
+        """Queue every frame of one request; all-or-nothing on capacity."""
+        acquired = 0
+        for _ in frames:
+            if not self._slots.acquire(blocking=False):
+                for _ in range(acquired):
+                    self._slots.release()
+                raise PoolBusy()
+            acquired += 1
+
+        if track is not None:
+            # A camera's frames run in capture order on one thread, so its
+            # track and votes follow the frame sequence
+            batch = self._executor.submit(_recognize_in_order, frames, self.batcher, track)
+            batch.add_done_callback(lambda _: [self._slots.release() for _ in frames])
+            return _split(batch, len(frames))
+
+        futures = []
+        for frame in frames:
+            future = self._executor.submit(recognize_frame, frame, self.batcher, track)
+            future.add_done_callback(lambda _: self._slots.release())
+            futures.append(future)
+        return futures
+
+
+def _recognize_in_order(frames, batcher, track):
+    return [recognize_frame(frame, batcher, track) for frame in frames]
+
+
+def _split(batch, count):
+    # One future per frame of a batch future that returns a list
+    futures = [Future() for _ in range(count)]
+
+    def done(batch):
+        if batch.exception() is not None:
+            for future in futures:
+                future.set_exception(batch.exception())
+            return
+        for future, result in zip(futures, batch.result()):
+            future.set_result(result)
+
+    batch.add_done_callback(done)
+    return futures
+
+
+def decode_frame(data):
+    if not data:
+        return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def max_distance(model):
+    # Distances depend on the model's feature extractor, so unless configured
+    # the threshold comes from that extractor
+    return Config.VOTE_MAX_DISTANCE or model.extractor.max_distance
+
+
+@metrics.timed('recognize')
+def recognize_frame(frame, batcher=None, track=None):
+    model = registry.model()
+    if track is None:
+        results, _ = _recognize(frame, model, batcher)
+        for face in results:
+            face['identity'] = single_frame(face['label'], face['distance'], max_distance(model))
+        return results
+    with track.lock:
+        results, reused = _recognize(frame, model, batcher, track)
+        if model is not None:
+            _vote(track, results, max_distance(model), reused)
+        return results
+
+
+def _vote(track, results, max_distance, reused=False):
+    sessions = {}
+    for face_id, face in zip(track.face_ids, results):
+        session = track.sessions.get(face_id) or VoteSession(
+            Config.VOTE_WINDOW, Config.VOTE_MIN_VOTES, max_distance)
+        if reused:
+            face['identity'] = session.decision  # the same match again is not a new vote
+        else:
+            face['identity'] = session.add(face['label'], face['distance'])
+        face['votes'] = session.leader()[1]
+        sessions[face_id] = session
+    track.sessions = sessions  # faces that left the frame lose their votes
+
+
+def _settled(track):
+    # Faces still being voted on need fresh matches, even while they hold still
+    return all(getattr(track.sessions.get(face_id), 'decision', None) is not None
+               for face_id in track.face_ids)
+
+
+def _recognize(frame, model, batcher, track=None):
+    """``(results, reused)``; reused results are copies of the track's last ones."""
+    faces, changed = detector.detect(frame, track)
+    if model is None or len(faces) == 0:
+        return [], False
+    if track is not None:
+        reuse = not changed and track.results_key == model.version and _settled(track)
+        metrics.cache('recognition', reuse)
+        if reuse:
+            return [dict(face) for face in track.results], True  # same faces, same model
+
+    crops = np.stack([face_sample(frame, box).reshape(-1) for box in faces])
+    with metrics.timer('match'):
+        matches = batcher.match(crops, model) if batcher else model.match(crops)
+    results = [
+        {
+            'box': [int(x), int(y), int(w), int(h)],
+            'label': match.label,
+            'distance': round(match.distance, 4),
+            'confidence': round(match.confidence, 3),
+        }
+        for (x, y, w, h), match in zip(faces, matches)
+    ]
+    if track is not None:
+        track.results, track.results_key = results, model.version
+        results = [dict(face) for face in results]
+    return results, False
@@ -0,0 +1,122 @@
+from datetime import date, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from models import db, AttendanceRecord, DailyRollup, PersonMonthRollup
+
+# --------------------------
+# Materialized attendance rollups
+# --------------------------
+# daily_rollup holds the head count and first/last arrival of every day;
+# person_month_rollup holds per-person present days and earliest arrival per
+# calendar month. Both are bumped in the same transaction that inserts a mark,
+# so a period summary reads a handful of rollup rows plus raw marks for at
+# most the two partial months at the edges of the range.
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def record(conn, row):
+    """Fold one newly inserted attendance row into the rollups."""
+    daily = insert(DailyRollup.__table__).values(date=row['date'], present=1,
+                                                 first_seen=row['time'], last_seen=row['time'])
+    conn.execute(daily.on_conflict_do_update(
+        index_elements=['date'],
+        set_={
+            'present': DailyRollup.__table__.c.present + 1,
+            'first_seen': func.min(DailyRollup.__table__.c.first_seen, daily.excluded.first_seen),
+            'last_seen': func.max(DailyRollup.__table__.c.last_seen, daily.excluded.last_seen),
+        },
+    ))
+
+    person = insert(PersonMonthRollup.__table__).values(username=row['username'], month=month_start(row['date']),
+                                                        roll=row['roll'], present_days=1, first_seen=row['time'])
+    conn.execute(person.on_conflict_do_update(
+        index_elements=['username', 'month'],
+        set_={
+            'present_days': PersonMonthRollup.__table__.c.present_days + 1,
+            'first_seen': func.min(PersonMonthRollup.__table__.c.first_seen, person.excluded.first_seen),
+        },
+    ))
+
+
+def rebuild():
+    """Recompute every rollup from attendance_record."""
+    a = AttendanceRecord.__table__
+    db.session.execute(DailyRollup.__table__.delete())
+    db.session.execute(PersonMonthRollup.__table__.delete())
+    db.session.execute(insert(DailyRollup.__table__).from_select(
+        ['date', 'present', 'first_seen', 'last_seen'],
+        select(a.c.date, func.count(), func.min(a.c.time), func.max(a.c.time)).group_by(a.c.date),
+    ))
+    month = func.date(a.c.date, 'start of month')
+    db.session.execute(insert(PersonMonthRollup.__table__).from_select(
+        ['username', 'month', 'roll', 'present_days', 'first_seen'],
+        select(a.c.username, month, func.max(a.c.roll), func.count(), func.min(a.c.time))
+        .group_by(a.c.username, month),
+    ))
+    db.session.commit()
+    return DailyRollup.query.count(), PersonMonthRollup.query.count()
+
+
+def _raw_person_counts(start, end):
+    a = AttendanceRecord
+    rows = (db.session.query(a.username, func.max(a.roll), func.count(), func.min(a.time))
+            .filter(a.date >= start, a.date <= end).group_by(a.username))
+    return rows.all()
+
+
+def summary(start, end):
+    """Daily head counts and per-person totals for ``start``..``end`` inclusive."""
+    days = (DailyRollup.query.filter(DailyRollup.date >= start, DailyRollup.date <= end)
+            .order_by(DailyRollup.date).all())
+    working_days = sum(1 for d in days if d.present)
+
+    # Whole months come from the monthly rollup, the partial edges from raw marks
+    first_full = start if start.day == 1 else next_month(start)
+    end_next = end + timedelta(days=1)
+    last_full = end_next if end_next.day == 1 else month_start(end)
+    parts = []
+    if first_full < last_full:
+        m = PersonMonthRollup
+        parts += (db.session.query(m.username, func.max(m.roll), func.sum(m.present_days), func.min(m.first_seen))
+                  .filter(m.month >= first_full, m.month < last_full).group_by(m.username).all())
+        if start < first_full:
+            parts += _raw_person_counts(start, first_full - timedelta(days=1))
+        if last_full <= end:
+            parts += _raw_person_counts(last_full, end)
+    else:
+        parts += _raw_person_counts(start, end)
+
+    people = {}
+    for username, roll, present, first_seen in parts:
+        p = people.setdefault(username, {'username': username, 'roll': roll, 'present_days': 0, 'first_seen': first_seen})
+        p['present_days'] += present
+        if first_seen and (p['first_seen'] is None or first_seen < p['first_seen']):
+            p['first_seen'] = first_seen
+    for p in people.values():
+        p['percentage'] = round(100 * p['present_days'] / working_days, 1) if working_days else 0.0
+
+    return {
+        'days': [{'date': d.date, 'present': d.present, 'first_seen': d.first_seen, 'last_seen': d.last_seen} for d in days],
+        'working_days': working_days,
+        'people': sorted(people.values(), key=lambda p: (-p['present_days'], p['username'])),
+    }
+
+
+def period_bounds(period, today=None):
+    """(start, end) for the preset periods offered on the analytics page."""
+    today = today or date.today()
+    if period == 'week':
+        return today - timedelta(days=today.weekday()), today
+    if period == 'month':
+        return month_start(today), today
+    if period == 'semester':
+        # Jan-Jun and Jul-Dec
+        return date(today.year, 1 if today.month <= 6 else 7, 1), today
+    raise ValueError(f"Unknown period: {period}")
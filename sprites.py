@@ -0,0 +1,54 @@
+import os
+import tempfile
+import cv2
+import numpy as np
+import face_ingest
+
+# --------------------------
+# Per-identity thumbnail sprites
+# --------------------------
+# The registered-faces page shows one pre-built strip of thumbnails per
+# person instead of one request per image. A strip is rebuilt only when that
+# person's images change (identities.refresh) and is served with a long
+# max-age plus an ETag; its URL carries the identity's update time, so a
+# rebuilt strip gets a new URL.
+
+SPRITES_DIR = 'static/sprites'
+TILE_SIZE = face_ingest.IMAGE_SIZE
+
+
+def sprite_path(name, sprites_dir=SPRITES_DIR):
+    return os.path.join(sprites_dir, f"{name}.jpg")
+
+
+def build(name, image_paths, sprites_dir=SPRITES_DIR):
+    """Write ``name``'s strip from ``image_paths`` (left to right); False if none could be read."""
+    tiles = []
+    for path in image_paths:
+        image = cv2.imread(path)
+        if image is not None:
+            tiles.append(cv2.resize(image, TILE_SIZE))
+    if not tiles:
+        remove(name, sprites_dir)
+        return False
+
+    ok, encoded = cv2.imencode('.jpg', np.hstack(tiles), [cv2.IMWRITE_JPEG_QUALITY, 85])
+    os.makedirs(sprites_dir, exist_ok=True)
+    path = sprite_path(name, sprites_dir)
+    # A private temp file per build: threads of one worker share a pid
+    fd, tmp_path = tempfile.mkstemp(dir=sprites_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encoded.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return True
+
+
+def remove(name, sprites_dir=SPRITES_DIR):
+    try:
+        os.remove(sprite_path(name, sprites_dir))
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,95 @@
+# stress_attendance.py
+# Hammers the attendance write path from several processes (each with several
+# threads) against a throwaway SQLite database, then checks that every person
+# ended up with exactly one row and exactly one successful mark.
+#
+#   python stress_attendance.py --processes 8 --threads 8 --people 500
+import argparse
+import multiprocessing as mp
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+
+def make_app(db_path):
+    from flask import Flask
+    from config import Config
+    from models import db
+    from attendance import writer
+
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path
+    db.init_app(app)
+    writer.init_app(app)
+    return app
+
+
+def hammer(db_path, worker_id, threads, people, start, results):
+    from attendance import log_attendance
+
+    app = make_app(db_path)
+    start.wait()
+    when = datetime(2025, 1, 6, 9, 0, 0)
+
+    def mark(i):
+        with app.app_context():
+            # Every worker walks the roster from a different offset, so the
+            # same person is hit by many processes at about the same time.
+            person = (i + worker_id * 7) % people
+            return person if log_attendance(f"Student{person}_{1000 + person}", when) else None
+
+    with ThreadPoolExecutor(threads) as pool:
+        marked = [p for p in pool.map(mark, range(people * 2)) if p is not None]
+    results.put(marked)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stress-test concurrent attendance marking.")
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--people', type=int, default=500)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    app = make_app(db_path)
+    with app.app_context():
+        from models import db
+        db.create_all()
+
+    ctx = mp.get_context('spawn')
+    start, results = ctx.Event(), ctx.Queue()
+    procs = [ctx.Process(target=hammer, args=(db_path, w, args.threads, args.people, start, results))
+             for w in range(args.processes)]
+    for p in procs:
+        p.start()
+    time.sleep(1)  # let every process import and connect before the gun
+    started = time.perf_counter()
+    start.set()
+    marked = [person for _ in procs for person in results.get()]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - started
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT COUNT(*) FROM attendance_record").fetchone()[0]
+    dupes = conn.execute(
+        "SELECT COUNT(*) FROM (SELECT username FROM attendance_record GROUP BY username, date HAVING COUNT(*) > 1)"
+    ).fetchone()[0]
+
+    attempts = args.processes * args.people * 2
+    print(f"{attempts} marks from {args.processes} processes x {args.threads} threads in {elapsed:.2f}s "
+          f"({attempts / elapsed:.0f} marks/s)")
+    print(f"rows={rows} successful_marks={len(marked)} distinct_marked={len(set(marked))} duplicates={dupes}")
+
+    ok = rows == args.people and len(marked) == args.people and len(set(marked)) == args.people and dupes == 0
+    print("✅ exactly one row per person" if ok else "❌ attendance invariant violated")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
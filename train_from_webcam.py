@@ -1,79 +1,77 @@
 import os
+import sys
 import cv2
 import numpy as np
-import joblib
-from sklearn.neighbors import KNeighborsClassifier
-
-def capture_faces(user_folder, max_images=50):
-    os.makedirs(user_folder, exist_ok=True)
+import face_store
+from config import Config
+from detection import Track
+from enrollment import Enrollment
+import model_store
+from recognition import detector
+
+def capture_faces(user_folder, max_images=Config.ENROLL_TARGET_SAMPLES):
+    enroll = Enrollment(user_folder, max_images,
+                        min_sharpness=Config.ENROLL_MIN_SHARPNESS,
+                        min_face=Config.ENROLL_MIN_FACE,
+                        duplicate_distance=Config.ENROLL_DUPLICATE_DISTANCE)
     cap = cv2.VideoCapture(0)
-    face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-    
-    count = 0
+    track = Track()  # same downscaled, tracked detection as the kiosk
+    frames = 0
     print("📸 Starting webcam. Press ESC to cancel.")
 
-    while True:
+    while not enroll.done and frames < Config.ENROLL_MAX_FRAMES:
         ret, frame = cap.read()
         if not ret:
             break
+        frames += 1
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+        faces, _ = detector.detect(frame, track)
+        enroll.offer(frame, faces)
 
         for (x, y, w, h) in faces:
-            face_img = frame[y:y+h, x:x+w]
-            face_resized = cv2.resize(face_img, (50, 50))
-            img_path = os.path.join(user_folder, f'{count}.jpg')
-            cv2.imwrite(img_path, face_resized)
-            count += 1
-
             cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
-            cv2.putText(frame, f'Images Captured: {count}/{max_images}', (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
-
-            if count >= max_images:
-                break
+        cv2.putText(frame, f'Images Captured: {enroll.count}/{max_images}', (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
 
         cv2.imshow('Capturing Faces', frame)
-        if cv2.waitKey(1) == 27 or count >= max_images:
+        if cv2.waitKey(1) == 27:
             break
 
     cap.release()
     cv2.destroyAllWindows()
-    print(f"✅ Saved {count} images to {user_folder}")
+    enroll.close()
+    skipped = ", ".join(f"{n} {reason}" for reason, n in sorted(enroll.rejected.items()))
+    print(f"✅ Saved {enroll.count} images to {user_folder}" + (f" (skipped {skipped})" if skipped else ""))
 
 
-def train_model(base_dir='static/faces', model_path='static/face_recognition_model.pkl'):
-    faces, labels = [], []
+def train_model(base_dir='static/faces', model_dir='static/model', features_dir='static/features', rebuild=False):
+    if rebuild:
+        # Re-check every image; only new or changed files are decoded
+        decoded = face_store.rebuild(base_dir, features_dir)
+        print(f"🔄 Decoded {decoded} new or changed images.")
+    else:
+        face_store.sync(base_dir, features_dir)
+    faces, labels = face_store.load_features(features_dir)
 
-    for user_dir in os.listdir(base_dir):
-        user_path = os.path.join(base_dir, user_dir)
-        if os.path.isdir(user_path):
-            for img_name in os.listdir(user_path):
-                img_path = os.path.join(user_path, img_name)
-                img = cv2.imread(img_path)
-                if img is not None:
-                    resized = cv2.resize(img, (50, 50)).flatten()
-                    faces.append(resized)
-                    labels.append(user_dir)
-
-    if not faces:
+    if not len(faces):
         print("❌ No training data found.")
         return
 
-    knn = KNeighborsClassifier(n_neighbors=5)
-    knn.fit(faces, labels)
-    os.makedirs(os.path.dirname(model_path), exist_ok=True)
-    joblib.dump(knn, model_path)
+    model_store.save_model(faces, labels, model_dir, n_neighbors=5, extractor=Config.FEATURE_EXTRACTOR)
 
-    print(f"✅ Model trained and saved at {model_path}")
+    print(f"✅ Model trained and saved at {model_dir}")
 
 
 if __name__ == '__main__':
+    if '--rebuild' in sys.argv:
+        train_model(rebuild=True)
+        sys.exit()
+
     print("👤 New User Registration")
     name = input("Enter full name (e.g., om): ").strip()
     roll = input("Enter roll number (e.g., 101): ").strip()
     user_folder = os.path.join('static/faces', f'{name}_{roll}')
 
     capture_faces(user_folder)
+    face_store.add_identity(f'{name}_{roll}')
     train_model()
@@ -0,0 +1,212 @@
+import csv
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import func, insert, select, union
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
+from werkzeug.security import generate_password_hash
+from models import db, User, Identity
+
+# --------------------------
+# Admin user directory
+# --------------------------
+# Role counts come from one GROUP BY over the role index. Listing and search
+# are keyset-paginated on username (the unique index), so page N costs the
+# same as page 1. Search is a case-insensitive prefix match on username
+# (expression index on lower(username)) or on roll (identity.roll index),
+# written as range conditions so SQLite always seeks the index.
+
+
+def ensure_indexes():
+    # create_all() skips tables that already exist, so add new indexes to them
+    with db.engine.begin() as conn:
+        for index in User.__table__.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def role_counts():
+    counts = {'admin': 0, 'user': 0}
+    counts.update(db.session.query(User.role, func.count()).group_by(User.role).all())
+    return counts
+
+
+def _prefix_range(prefix):
+    # "abc" -> ["abc", "abd"): every string starting with the prefix
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _matching_ids(q):
+    lo, hi = _prefix_range(q.lower())
+    by_name = select(User.id).where(func.lower(User.username) >= lo, func.lower(User.username) < hi)
+    lo, hi = _prefix_range(q)
+    by_roll = (select(User.id).join(Identity, Identity.username == User.username)
+               .where(Identity.roll >= lo, Identity.roll < hi))
+    return union(by_name, by_roll)
+
+
+def directory_page(q=None, after=None, limit=20):
+    """One page of users ordered by username.
+
+    Pass the returned ``next_after`` username back as ``after`` for the
+    following page; it is None on the last page.
+    """
+    query = User.query
+    if q:
+        query = query.filter(User.id.in_(_matching_ids(q)))
+    if after:
+        query = query.filter(User.username > after)
+    users = query.order_by(User.username).limit(limit + 1).all()
+    next_after = users[limit - 1].username if len(users) > limit else None
+    return users[:limit], next_after
+
+
+# --------------------------
+# Bulk provisioning
+# --------------------------
+# A CSV with username,password[,role] columns. Rows are validated first, the
+# usernames checked against the table in one pass, and only then are the
+# passwords hashed: each hash is deliberately slow (~0.1s), so they run on a
+# pool of spawned processes. Accounts are inserted BATCH_SIZE per transaction.
+# Used by the /bulk-users upload (as a background job) and bulk_users.py.
+
+IMPORTS_DIR = 'database/imports'
+ROLES = ('user', 'admin')
+CHECK_CHUNK = 500  # usernames per IN (...) lookup
+PARALLEL_MIN = 8   # below this, spawning processes costs more than it saves
+
+
+def read_rows(stream):
+    """``(rows, errors)`` from a CSV text stream.
+
+    rows are ``(line, username, password, role)``; errors ``(line, username, reason)``.
+    """
+    reader = csv.DictReader(stream)
+    reader.fieldnames = [c.strip().lower() for c in reader.fieldnames or []]
+    if not {'username', 'password'} <= set(reader.fieldnames):
+        return [], [(1, '', "header must have username and password columns")]
+
+    max_length = User.__table__.c.username.type.length
+    rows, errors, seen = [], [], set()
+    for record in reader:
+        # Passwords are kept exactly as given: login compares them unstripped
+        line = reader.line_num
+        username = (record.get('username') or '').strip()
+        password = record.get('password') or ''
+        role = (record.get('role') or '').strip() or 'user'
+        if None in record:
+            errors.append((line, username, "too many columns (quote values that contain commas)"))
+        elif not username or not password:
+            errors.append((line, username, "username and password are required"))
+        elif len(username) > max_length:
+            errors.append((line, username, f"username longer than {max_length} characters"))
+        elif role not in ROLES:
+            errors.append((line, username, f"role must be one of {', '.join(ROLES)}"))
+        elif username in seen:
+            errors.append((line, username, "duplicate username in file"))
+        else:
+            seen.add(username)
+            rows.append((line, username, password, role))
+    return rows, errors
+
+
+def existing_usernames(usernames):
+    usernames = list(usernames)
+    taken = set()
+    for start in range(0, len(usernames), CHECK_CHUNK):
+        chunk = usernames[start:start + CHECK_CHUNK]
+        taken.update(db.session.scalars(select(User.username).where(User.username.in_(chunk))))
+    return taken
+
+
+def hash_passwords(passwords, workers, on_progress=None):
+    if workers <= 1 or len(passwords) < PARALLEL_MIN or multiprocessing.parent_process() is not None:
+        hashes = []
+        for password in passwords:
+            hashes.append(generate_password_hash(password))
+            if on_progress:
+                on_progress(len(hashes), len(passwords))
+        return hashes
+
+    # spawn, not fork: the web process has threads (and locks) of its own
+    context = multiprocessing.get_context('spawn')
+    chunksize = max(1, min(64, len(passwords) // (workers * 8)))
+    hashes = []
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        for digest in pool.map(generate_password_hash, passwords, chunksize=chunksize):
+            hashes.append(digest)
+            if on_progress and len(hashes) % chunksize == 0:
+                on_progress(len(hashes), len(passwords))
+    return hashes
+
+
+def _insert(batch, errors):
+    # batch: (line, username, password hash, role) tuples, one transaction
+    try:
+        db.session.execute(insert(User), [{'username': u, 'password_hash': h, 'role': r} for _, u, h, r in batch])
+        db.session.commit()
+        return len(batch)
+    except IntegrityError:
+        # Someone added one of these usernames since the check: skip those
+        db.session.rollback()
+        taken = existing_usernames(username for _, username, _, _ in batch)
+        errors.extend((line, username, "username already exists") for line, username, _, _ in batch if username in taken)
+        batch = [row for row in batch if row[1] not in taken]
+        return _insert(batch, errors) if batch else 0
+
+
+def provision(stream, workers=2, batch_size=500, on_progress=None):
+    """Create the accounts in a CSV stream; returns a report dict.
+
+    ``on_progress(percent, message)`` is called while hashing and inserting.
+    """
+    started = time.perf_counter()
+    rows, errors = read_rows(stream)
+    total = len(rows) + len(errors)
+    taken = existing_usernames(username for _, username, _, _ in rows)
+    errors.extend((line, username, "username already exists") for line, username, _, _ in rows if username in taken)
+    rows = [row for row in rows if row[1] not in taken]
+
+    def hashed(done, total):
+        if on_progress:
+            on_progress(80 * done / total, f"Hashed {done}/{total} passwords")
+
+    hash_started = time.perf_counter()
+    hashes = hash_passwords([password for _, _, password, _ in rows], workers, hashed)
+    hash_seconds = time.perf_counter() - hash_started
+
+    created = 0
+    for start in range(0, len(rows), batch_size):
+        batch = [(line, username, digest, role)
+                 for (line, username, _, role), digest in zip(rows[start:start + batch_size], hashes[start:start + batch_size])]
+        created += _insert(batch, errors)
+        if on_progress:
+            on_progress(80 + 20 * (start + len(batch)) / len(rows), f"Inserted {created} users")
+
+    seconds = time.perf_counter() - started
+    errors.sort()
+    return {
+        'rows': total,
+        'created': created,
+        'errors': errors,
+        'seconds': round(seconds, 2),
+        'hash_seconds': round(hash_seconds, 2),
+        'users_per_s': round(created / seconds, 1) if seconds else 0.0,
+    }
+
+
+def summary(report):
+    return (f"Created {report['created']} users, {len(report['errors'])} errors in "
+            f"{report['seconds']}s ({report['users_per_s']} users/s; hashing {report['hash_seconds']}s)")
+
+
+def errors_path(job_id):
+    return os.path.join(IMPORTS_DIR, f"{job_id}-errors.csv")
+
+
+def write_errors(errors, path):
+    with open(path, 'w', newline='') as f:
+        out = csv.writer(f)
+        out.writerow(['line', 'username', 'error'])
+        out.writerows(errors)
@@ -0,0 +1,53 @@
+from collections import Counter, deque
+import statistics
+
+# --------------------------
+# Multi-frame temporal voting
+# --------------------------
+# A single KNN prediction is not enough to mark someone present. Each tracked
+# face gets a VoteSession that collects the per-frame (label, distance) over a
+# short window: once ``min_votes`` frames agree on one label with a median
+# distance within ``max_distance`` that label is committed, and if the window
+# fills without that the face is reported unknown and voting starts over.
+
+UNKNOWN = 'unknown'
+
+
+class VoteSession:
+    def __init__(self, window=5, min_votes=3, max_distance=0.03):
+        self.window = window
+        self.min_votes = min_votes
+        self.max_distance = max_distance
+        self.votes = deque(maxlen=window)
+        self.decision = None
+
+    def add(self, label, distance):
+        """Record one frame's match; return the committed label, UNKNOWN, or None while undecided."""
+        if self.decision is not None:
+            return self.decision  # committed faces are not re-voted while tracked
+        self.votes.append((label, distance))
+        return self.decide()
+
+    def decide(self):
+        if not self.votes:
+            return None
+        label, count = Counter(l for l, _ in self.votes).most_common(1)[0]
+        distance = statistics.median(d for l, d in self.votes if l == label)
+        if label is not None and count >= self.min_votes and distance <= self.max_distance:
+            self.decision = label
+            return label
+        if len(self.votes) >= self.window:
+            self.votes.clear()  # no consensus: report unknown and start a fresh window
+            return UNKNOWN
+        return None
+
+    def leader(self):
+        """``(label, agreeing votes)`` of the current front-runner."""
+        if not self.votes:
+            return None, 0
+        return Counter(l for l, _ in self.votes).most_common(1)[0]
+
+
+def single_frame(label, distance, max_distance):
+    # Clients without a kiosk id cannot be tracked: decide on the one frame
+    return label if label is not None and distance <= max_distance else UNKNOWN
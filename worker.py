@@ -0,0 +1,94 @@
+# worker.py
+# Background worker for enrollment, retraining and user import jobs (see jobs.py).
+# Run it next to the web server:  python worker.py
+import os
+import shutil
+import time
+import traceback
+import face_store
+import identities
+import jobs
+import model_store
+import users
+from models import db
+from config import Config
+
+POLL_SECONDS = 1.0
+
+
+def run_import(job):
+    path = os.path.join(users.IMPORTS_DIR, job.source)
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            report = users.provision(f, Config.IMPORT_WORKERS, Config.IMPORT_BATCH_SIZE,
+                                     on_progress=lambda progress, message: jobs.report(job, progress, message))
+    finally:
+        os.remove(path)  # it holds plaintext passwords
+    if report['errors']:
+        users.write_errors(report['errors'], users.errors_path(job.id))
+    jobs.report(job, 100, users.summary(report), status='done')
+
+
+def release(name):
+    # Undo an enrollment that never got usable samples, freeing its roll
+    shutil.rmtree(f"{face_store.FACES_DIR}/{name}", ignore_errors=True)
+    face_store.remove_identity(name)
+    identities.remove(name)
+
+
+def run_enroll(job, capture):
+    jobs.report(job, 0, "Capturing face images")
+    try:
+        kept, rejected = capture(f"{face_store.FACES_DIR}/{job.identity}",
+                                 on_progress=lambda count, total: jobs.report(job, 70 * count / total))
+        skipped = ", ".join(f"{n} {reason}" for reason, n in sorted(rejected.items()))
+        if not kept:
+            release(job.identity)
+            jobs.report(job, 100, "No usable face samples" + (f" (skipped {skipped})" if skipped else "")
+                        + "; registration released", status='failed')
+            return False
+        jobs.report(job, 75, f"Kept {kept} samples" + (f" (skipped {skipped})" if skipped else "") + "; extracting features")
+        face_store.add_identity(job.identity)
+    except Exception:
+        db.session.rollback()
+        release(job.identity)
+        raise
+    identities.refresh(job.identity)
+    return True
+
+
+def run_job(job, train, capture):
+    if job.kind == 'import_users':
+        return run_import(job)
+    if job.kind == 'enroll' and not run_enroll(job, capture):
+        return
+
+    merged = jobs.merge_pending_retrains(job)
+    jobs.report(job, 85, "Training model" + (f" ({merged} merged requests)" if merged else ""))
+    train()
+    jobs.report(job, 100, "Model published", status='done')
+
+
+def run(app, train, capture):
+    with app.app_context():
+        jobs.requeue_interrupted()
+        # Build the model on first start (or after a model format change).
+        # Not at import: spawned decode processes re-import the main module.
+        if not model_store.model_exists():
+            jobs.enqueue('retrain')
+        while True:
+            job = jobs.claim_next()
+            if job is None:
+                time.sleep(POLL_SECONDS)
+                continue
+            try:
+                run_job(job, train, capture)
+            except Exception as e:
+                traceback.print_exc()
+                jobs.report(job, message=f"Failed: {e}"[:255], status='failed')
+
+
+if __name__ == '__main__':
+    from app import app, train_model, capture_faces
+    print("🛠️ Training worker started.")
+    run(app, train_model, capture_faces)